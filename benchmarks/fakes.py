@@ -0,0 +1,189 @@
+"""Local stand-ins for the external services used by the auth flows."""
+from typing import Optional
+
+import asyncio
+import base64
+import re
+import secrets
+import time
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, RedirectResponse
+from starlette.routing import Route
+
+
+# ==================== SMTP ====================
+
+_TOKEN = re.compile(rb"token=([A-Za-z0-9_\-.]+)")
+
+
+class SMTPSink:
+    """Minimal SMTP server that accepts every message and hands magic-link tokens to waiters."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.messages = 0
+        self._server: Optional[asyncio.base_events.Server] = None
+        # Queues per address: concurrent iterations may log in the same user
+        self._waiters: dict[str, list[asyncio.Future]] = {}
+        self._tokens: dict[str, list[bytes]] = {}
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def wait_for_token(self, email: str, timeout: float = 30) -> str:
+        """Verification token from the next message delivered to `email`."""
+        email = email.lower()
+        tokens = self._tokens.get(email)
+        if tokens:
+            return tokens.pop(0).decode()
+        future = asyncio.get_running_loop().create_future()
+        waiters = self._waiters.setdefault(email, [])
+        waiters.append(future)
+        try:
+            return (await asyncio.wait_for(future, timeout)).decode()
+        finally:
+            if future in waiters:
+                waiters.remove(future)
+
+    def _deliver(self, recipients: list[str], data: bytes) -> None:
+        self.messages += 1
+        match = _TOKEN.search(data)
+        if match is None:
+            return
+        for recipient in recipients:
+            waiters = self._waiters.get(recipient)
+            while waiters and waiters[0].done():
+                waiters.pop(0)
+            if waiters:
+                waiters.pop(0).set_result(match.group(1))
+            else:
+                self._tokens.setdefault(recipient, []).append(match.group(1))
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        writer.write(b"220 sink ESMTP\r\n")
+        recipients: list[str] = []
+        try:
+            while line := await reader.readline():
+                command = line.decode(errors="replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+                if verb in ("EHLO", "HELO"):
+                    writer.write(b"250-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                elif verb == "AUTH":
+                    writer.write(b"235 2.7.0 Authentication successful\r\n")
+                elif verb == "RCPT":
+                    recipients.append(command.split(":", 1)[1].strip(" <>").lower())
+                    writer.write(b"250 OK\r\n")
+                elif verb == "DATA":
+                    writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                    await writer.drain()
+                    chunks = []
+                    while (chunk := await reader.readline()) not in (b".\r\n", b""):
+                        chunks.append(chunk)
+                    self._deliver(recipients, b"".join(chunks))
+                    recipients = []
+                    writer.write(b"250 OK\r\n")
+                elif verb == "RSET":
+                    recipients = []
+                    writer.write(b"250 OK\r\n")
+                elif verb == "QUIT":
+                    writer.write(b"221 Bye\r\n")
+                    await writer.drain()
+                    break
+                else:
+                    writer.write(b"250 OK\r\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+# ==================== OIDC ====================
+
+class FakeOIDCProvider:
+    """Authorization-code OIDC provider served in-process (mount with httpx.ASGITransport).
+
+    `/authorize` logs in whoever is named by the extra `email`/`sub` query
+    parameters and redirects back with a code, like a consent screen would.
+    """
+
+    def __init__(self, issuer: str = "http://oidc.bench", client_id: Optional[str] = None):
+        self.issuer = issuer
+        self.client_id = client_id
+        self.key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self.kid = "bench-" + secrets.token_hex(4)
+        self._codes: dict[str, dict] = {}
+        self.app = Starlette(routes=[
+            Route("/.well-known/openid-configuration", self.discovery),
+            Route("/jwks", self.jwks),
+            Route("/authorize", self.authorize),
+            Route("/token", self.token, methods=["POST"]),
+        ])
+
+    @property
+    def discovery_url(self) -> str:
+        return f"{self.issuer}/.well-known/openid-configuration"
+
+    async def discovery(self, request: Request):
+        return JSONResponse(
+            {
+                "issuer": self.issuer,
+                "authorization_endpoint": f"{self.issuer}/authorize",
+                "token_endpoint": f"{self.issuer}/token",
+                "jwks_uri": f"{self.issuer}/jwks",
+                "id_token_signing_alg_values_supported": ["RS256"],
+            },
+            headers={"Cache-Control": "public, max-age=3600"},
+        )
+
+    async def jwks(self, request: Request):
+        jwk = RSAAlgorithm.to_jwk(self.key.public_key(), as_dict=True)
+        jwk.update({"kid": self.kid, "alg": "RS256", "use": "sig"})
+        return JSONResponse({"keys": [jwk]}, headers={"Cache-Control": "public, max-age=3600"})
+
+    async def authorize(self, request: Request):
+        params = request.query_params
+        code = secrets.token_urlsafe(16)
+        self._codes[code] = {
+            "aud": params["client_id"],
+            "nonce": params.get("nonce"),
+            "email": params["email"],
+            "sub": params.get("sub") or params["email"],
+        }
+        return RedirectResponse(f"{params['redirect_uri']}?code={code}&state={params['state']}", status_code=302)
+
+    async def token(self, request: Request):
+        form = await request.form()
+        grant = self._codes.pop(form.get("code"), None)
+        if grant is None:
+            return JSONResponse({"error": "invalid_grant"}, status_code=400)
+        now = int(time.time())
+        local = grant["email"].split("@")[0]
+        claims = {
+            "iss": self.issuer,
+            "aud": grant["aud"],
+            "sub": grant["sub"],
+            "email": grant["email"],
+            "email_verified": True,
+            "name": local.title(),
+            "given_name": local.title(),
+            "family_name": "Bench",
+            "picture": None,
+            "nonce": grant["nonce"],
+            "iat": now,
+            "exp": now + 600,
+        }
+        id_token = jwt.encode(claims, self.key, algorithm="RS256", headers={"kid": self.kid})
+        access_token = base64.urlsafe_b64encode(secrets.token_bytes(24)).decode()
+        return JSONResponse({"access_token": access_token, "token_type": "Bearer", "expires_in": 3600, "id_token": id_token})
@@ -0,0 +1,114 @@
+"""Microbenchmark the JWT codec against plain PyJWT calls.
+
+    python -m benchmarks.jwt_codec
+    python -m benchmarks.jwt_codec --algorithm HS256 --algorithm RS256 --number 5000
+
+The PyJWT side is what TokenService did before the codec: `jwt.encode` with
+datetime/uuid4 claims per token, and `jwt.decode` followed by a `type` check.
+"""
+from datetime import datetime, timedelta, timezone
+
+import argparse
+import os
+import tempfile
+import time
+import timeit
+import uuid
+import jwt
+
+from services.keys_service import KeyRing
+from utils.jwt_utils import JWTCodec, new_jti
+
+SECRET = "benchmark-secret-key-of-reasonable-length"
+DATA = {"sub": "user@example.com", "uid": str(uuid.uuid4()), "role": "user", "rv": 0}
+
+
+class PyJWTTokens:
+    def __init__(self, algorithm: str, ring: KeyRing):
+        self.algorithm = algorithm
+        self.ring = ring
+
+    def _claims(self, token_type: str, delta: timedelta) -> dict:
+        claims = DATA.copy()
+        claims.update({"exp": datetime.now(timezone.utc) + delta, "type": token_type, "jti": uuid.uuid4().hex})
+        return claims
+
+    def encode(self, claims: dict) -> str:
+        if self.algorithm.startswith("HS"):
+            return jwt.encode(claims, SECRET, algorithm=self.algorithm)
+        key = self.ring.signing_key()
+        return jwt.encode(claims, key.private_key, algorithm=self.algorithm, headers={"kid": key.kid})
+
+    def access(self) -> str:
+        return self.encode(self._claims("access", timedelta(minutes=30)))
+
+    def pair(self) -> tuple[str, str]:
+        refresh = self._claims("refresh", timedelta(days=7))
+        refresh["fam"] = refresh["jti"]
+        return self.access(), self.encode(refresh)
+
+    def decode(self, token: str) -> dict:
+        if self.algorithm.startswith("HS"):
+            payload = jwt.decode(token, SECRET, algorithms=[self.algorithm])
+        else:
+            kid = jwt.get_unverified_header(token).get("kid")
+            payload = jwt.decode(token, self.ring.verification_key(kid), algorithms=[self.algorithm])
+        if payload.get("type") != "access":
+            raise jwt.InvalidTokenError("type")
+        return payload
+
+
+class CodecTokens:
+    def __init__(self, algorithm: str, ring: KeyRing):
+        self.codec = JWTCodec(algorithm, SECRET, ring)
+
+    @staticmethod
+    def _claims(token_type: str, now: float, seconds: int, jti: str) -> dict:
+        claims = DATA.copy()
+        claims.update({"exp": int(now + seconds), "type": token_type, "jti": jti})
+        return claims
+
+    def access(self) -> str:
+        return self.codec.encode(self._claims("access", time.time(), 1800, new_jti()))
+
+    def pair(self) -> tuple[str, str]:
+        # Mirrors TokenService.issue_pair
+        now = time.time()
+        jtis = os.urandom(32).hex()
+        refresh = self._claims("refresh", now, 7 * 86400, jtis[32:])
+        refresh["fam"] = refresh["jti"]
+        return tuple(self.codec.encode_many([self._claims("access", now, 1800, jtis[:32]), refresh]))
+
+    def decode(self, token: str) -> dict:
+        return self.codec.decode(token, "access")
+
+
+def measure(fn, number: int) -> float:
+    """Best per-call time in microseconds over 5 repeats."""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark JWTCodec against PyJWT")
+    parser.add_argument("--algorithm", action="append", help="Repeatable; default HS256, RS256, ES256, EdDSA")
+    parser.add_argument("--number", type=int, default=2000, help="Calls per repeat")
+    args = parser.parse_args()
+
+    print(f"{'algorithm':10} {'operation':14} {'pyjwt us':>10} {'codec us':>10} {'speedup':>8}")
+    for algorithm in args.algorithm or ["HS256", "RS256", "ES256", "EdDSA"]:
+        ring = KeyRing(tempfile.mkdtemp(prefix="jwt-bench-"), algorithm, publish_seconds=0)
+        old, new = PyJWTTokens(algorithm, ring), CodecTokens(algorithm, ring)
+        token = new.access()
+        # Slow signatures (RSA) get fewer calls so a run stays short
+        number = max(args.number // 20, 50) if algorithm.startswith("RS") else args.number
+        for name, a, b in (
+            ("encode access", old.access, new.access),
+            ("issue pair", old.pair, new.pair),
+            ("decode access", lambda: old.decode(token), lambda: new.decode(token)),
+        ):
+            before, after = measure(a, number), measure(b, number)
+            print(f"{algorithm:10} {name:14} {before:10.1f} {after:10.1f} {before / after:7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import json
+
+from database import create_db_and_tables, session_scope, dispose_engines
+from services.blocklist_service import purge_expired_tokens, BLOCKLIST_PURGE_BATCH_SIZE
+from services.outbox_service import run_outbox_worker, OUTBOX_BATCH_SIZE, OUTBOX_CONCURRENCY, OUTBOX_POLL_SECONDS
+from utils.email_utlis import close_smtp_pool
+from services.keys_service import key_ring, is_asymmetric
+
+
+async def purge_blocklist(args):
+    async with session_scope() as db:
+        report = await purge_expired_tokens(db, batch_size=args.batch_size, max_batches=args.max_batches)
+    print(json.dumps(report.model_dump(), indent=2))
+
+
+async def outbox_worker(args):
+    try:
+        await run_outbox_worker(batch_size=args.batch_size, concurrency=args.concurrency, poll_seconds=args.poll_seconds)
+    finally:
+        await close_smtp_pool()
+
+
+async def rotate_keys(args):
+    if not is_asymmetric(key_ring.algorithm):
+        raise SystemExit(f"ALGORITHM={key_ring.algorithm} does not use a key ring (use RS256/ES256/EdDSA)")
+    key_ring.load()
+    new_key = key_ring.rotate() if args.force else key_ring.rotate_if_due()
+    retired = key_ring.retire_expired_keys()
+    print(json.dumps({"new_kid": new_key.kid if new_key else None, "retired": retired, "kids": key_ring.kids}, indent=2))
+
+
+async def run(args):
+    try:
+        await args.handler(args)
+    finally:
+        await dispose_engines()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    purge = subparsers.add_parser("purge-blocklist", help="Delete expired token_blocklist rows in batches")
+    purge.add_argument("--batch-size", type=int, default=BLOCKLIST_PURGE_BATCH_SIZE)
+    purge.add_argument("--max-batches", type=int, default=None)
+    purge.set_defaults(handler=purge_blocklist)
+
+    worker = subparsers.add_parser("outbox-worker", help="Deliver queued emails from the email outbox")
+    worker.add_argument("--batch-size", type=int, default=OUTBOX_BATCH_SIZE)
+    worker.add_argument("--concurrency", type=int, default=OUTBOX_CONCURRENCY)
+    worker.add_argument("--poll-seconds", type=float, default=OUTBOX_POLL_SECONDS)
+    worker.set_defaults(handler=outbox_worker)
+
+    rotate = subparsers.add_parser("rotate-keys", help="Generate a new JWT signing key when due and retire old ones")
+    rotate.add_argument("--force", action="store_true", help="Rotate even if the newest key is not due yet")
+    rotate.set_defaults(handler=rotate_keys)
+
+    args = parser.parse_args()
+    create_db_and_tables()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
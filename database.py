@@ -1,32 +1,568 @@
-from sqlalchemy import create_engine, event
-from sqlalchemy.orm import sessionmaker
+from contextlib import asynccontextmanager, AsyncExitStack, ExitStack
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+from sqlalchemy import create_engine, event, text, make_url, Select
+from sqlalchemy.orm import sessionmaker, Session, object_session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from starlette.requests import cookie_parser
+import inspect
+import math
 import os
+import random
+import time
 from models.users_models import Base
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")
 
+# Run DB I/O on the async engine (default). Set DATABASE_ASYNC=false to fall back
+# to the blocking sync session, e.g. to compare both paths in benchmarks.
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "true").lower() in ("1", "true", "yes")
+
+
+def _to_async_url(url: str) -> str:
+    """Map a sync DATABASE_URL to its async driver (aiosqlite / psycopg3 async)."""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:"):
+        return url.replace("postgresql:", "postgresql+psycopg:", 1)
+    if url.startswith("postgres:"):
+        return url.replace("postgres:", "postgresql+psycopg:", 1)
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _to_async_url(DATABASE_URL))
+
+
+# ==================== ENGINE PROFILES ====================
+# DATABASE_PROFILE picks a preset for the URL's backend; each option can be
+# overridden on its own with the env variables in _OPTION_ENV below.
+
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "balanced")
+
+ENGINE_PROFILES = {
+    "sqlite": {
+        # SQLite's own defaults: rollback journal, fsync on every commit, writers block readers
+        "default": {},
+        # WAL lets readers run alongside the writer; synchronous=NORMAL only fsyncs at
+        # checkpoints, so a power loss (not an app crash) can drop the last commits
+        "balanced": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": 5000,
+            "cache_size": -64000,
+            "temp_store": "MEMORY",
+            "mmap_size": 268435456,
+        },
+        # No fsync at all: for tests, benchmarks and throwaway dev databases
+        "fast": {
+            "journal_mode": "WAL",
+            "synchronous": "OFF",
+            "busy_timeout": 5000,
+            "cache_size": -256000,
+            "temp_store": "MEMORY",
+            "mmap_size": 1073741824,
+        },
+    },
+    "postgresql": {
+        "default": {},
+        "balanced": {"pool_size": 10, "max_overflow": 20, "pool_pre_ping": True, "pool_recycle": 1800},
+        # Fixed-size pool, no liveness check per checkout, server-side prepare from the first execution
+        "fast": {"pool_size": 20, "max_overflow": 0, "pool_pre_ping": False, "prepare_threshold": 1},
+        # Transaction-pooling PgBouncer cannot keep prepared statements across transactions
+        "pgbouncer": {"pool_size": 10, "max_overflow": 20, "pool_pre_ping": True, "prepare_threshold": None},
+    },
+}
+
+SQLITE_PRAGMAS = ("busy_timeout", "journal_mode", "synchronous", "cache_size", "temp_store", "mmap_size")
+POOL_OPTIONS = ("pool_size", "max_overflow", "pool_timeout", "pool_recycle", "pool_pre_ping", "query_cache_size")
+
+_PRAGMA_CHOICES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+
+def _flag(value: str) -> bool:
+    return value.lower() in ("1", "true", "yes")
+
+
+def _optional_int(value: str):
+    return None if value.lower() in ("", "none", "off") else int(value)
+
+
+_OPTION_ENV = {
+    "journal_mode": ("SQLITE_JOURNAL_MODE", str.upper),
+    "synchronous": ("SQLITE_SYNCHRONOUS", str.upper),
+    "busy_timeout": ("SQLITE_BUSY_TIMEOUT_MS", int),
+    "cache_size": ("SQLITE_CACHE_SIZE", int),
+    "temp_store": ("SQLITE_TEMP_STORE", str.upper),
+    "mmap_size": ("SQLITE_MMAP_SIZE", int),
+    "pool_size": ("DATABASE_POOL_SIZE", int),
+    "max_overflow": ("DATABASE_MAX_OVERFLOW", int),
+    "pool_timeout": ("DATABASE_POOL_TIMEOUT", float),
+    "pool_recycle": ("DATABASE_POOL_RECYCLE", int),
+    "pool_pre_ping": ("DATABASE_POOL_PRE_PING", _flag),
+    # SQLAlchemy's compiled statement cache, per engine
+    "query_cache_size": ("DATABASE_QUERY_CACHE_SIZE", int),
+    # psycopg server-side prepared statements; "none" disables them
+    "prepare_threshold": ("DATABASE_PREPARE_THRESHOLD", _optional_int),
+}
+
+
+def resolve_engine_options(url: str, profile: str = DATABASE_PROFILE) -> dict:
+    """Options of `profile` for the URL's backend, with env overrides applied and validated."""
+    backend = make_url(url).get_backend_name()
+    profiles = ENGINE_PROFILES.get(backend, {"default": {}})
+    if profile not in profiles:
+        raise ValueError(f"Unknown DATABASE_PROFILE {profile!r} for {backend}; expected one of {sorted(profiles)}")
+    options = dict(profiles[profile])
+    for option, (env_name, parse) in _OPTION_ENV.items():
+        # SQLite pragmas and psycopg options are ignored on other backends
+        if (option in SQLITE_PRAGMAS and backend != "sqlite") or (
+            option == "prepare_threshold" and backend != "postgresql"
+        ):
+            continue
+        value = os.getenv(env_name)
+        if value is not None:
+            options[option] = parse(value)
+
+    for option, value in options.items():
+        choices = _PRAGMA_CHOICES.get(option)
+        # Pragmas are interpolated into SQL, so only known keywords are accepted
+        if choices is not None and value not in choices:
+            raise ValueError(f"Invalid {option} {value!r}; expected one of {sorted(choices)}")
+    return options
+
+
+def _engine_kwargs(url: str, options: dict) -> dict:
+    kwargs = {option: options[option] for option in POOL_OPTIONS if option in options}
+    if url.startswith("sqlite+aiosqlite") and make_url(url).database not in (None, "", ":memory:"):
+        # SQLAlchemy < 2.0.38 defaults aiosqlite to NullPool: a new connection (and pragmas) per session
+        kwargs["poolclass"] = AsyncAdaptedQueuePool
+    connect_args = {}
+    if url.startswith("sqlite") and not url.startswith("sqlite+aiosqlite"):
+        connect_args["check_same_thread"] = False
+    if "prepare_threshold" in options:
+        connect_args["prepare_threshold"] = options["prepare_threshold"]
+    if connect_args:
+        kwargs["connect_args"] = connect_args
+    return kwargs
+
+
+ENGINE_OPTIONS = resolve_engine_options(DATABASE_URL)
+
 engine = create_engine(
     DATABASE_URL,
     # echo=True,
-    connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {}
+    **_engine_kwargs(DATABASE_URL, ENGINE_OPTIONS),
+)
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    # echo=True,
+    **_engine_kwargs(ASYNC_DATABASE_URL, ENGINE_OPTIONS),
 )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Optional read replicas (comma separated, same backend as DATABASE_URL); see READ REPLICAS below
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Reads of a client stay on the primary this long after it wrote; keep it above the replication lag
+DATABASE_STICKY_SECONDS = float(os.getenv("DATABASE_STICKY_SECONDS", "5"))
+DATABASE_STICKY_COOKIE = "db_primary_until"
+
+replica_engines = [
+    create_engine(url, **_engine_kwargs(url, resolve_engine_options(url)))
+    for url in DATABASE_REPLICA_URLS
+]
+async_replica_engines = [
+    create_async_engine(_to_async_url(url), **_engine_kwargs(_to_async_url(url), resolve_engine_options(url)))
+    for url in DATABASE_REPLICA_URLS
+]
+ReplicaSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=replica)
+    for replica in replica_engines
+]
+AsyncReplicaSessionLocals = [
+    async_sessionmaker(replica, autoflush=False, expire_on_commit=False)
+    for replica in async_replica_engines
+]
 
 def create_db_and_tables():
     Base.metadata.create_all(bind=engine)
 
-# Enable SQLite foreign key constraints when using SQLite
-if "sqlite" in DATABASE_URL:
-    @event.listens_for(engine, "connect")
+async def warm_pool(connections: int) -> None:
+    """Open `connections` pooled connections per engine (primary and replicas) at once
+    so the first requests do not pay for connecting."""
+    if connections <= 0:
+        return
+    if DATABASE_ASYNC:
+        async with AsyncExitStack() as stack:
+            for target in [async_engine, *async_replica_engines]:
+                for _ in range(connections):
+                    conn = await stack.enter_async_context(target.connect())
+                    await conn.execute(text("SELECT 1"))
+    else:
+        with ExitStack() as stack:
+            for target in [engine, *replica_engines]:
+                for _ in range(connections):
+                    stack.enter_context(target.connect()).execute(text("SELECT 1"))
+
+def dialect_insert(db, table):
+    """`INSERT` construct with `on_conflict_do_*` support for the session's dialect."""
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upserts are not supported on {dialect}")
+    return insert(table)
+
+async def dispose_engines() -> None:
+    """Close pooled async connections; pooled aiosqlite connections would otherwise keep the process alive."""
+    for target in [async_engine, *async_replica_engines]:
+        await target.dispose()
+
+def _enable_sqlite_pragmas(engines, options: dict) -> None:
+    """Enable SQLite foreign key constraints and the profile's pragmas on every new connection."""
+    pragmas = [f"PRAGMA {name}={options[name]}" for name in SQLITE_PRAGMAS if name in options]
+
     def set_sqlite_pragma(dbapi_connection, connection_record):
         cursor = dbapi_connection.cursor()
         cursor.execute("PRAGMA foreign_keys=ON")
+        for pragma in pragmas:
+            cursor.execute(pragma)
         cursor.close()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+    for target in engines:
+        event.listen(target, "connect", set_sqlite_pragma)
+
+
+if "sqlite" in DATABASE_URL:
+    _enable_sqlite_pragmas([engine, async_engine.sync_engine], ENGINE_OPTIONS)
+for _url, _replica, _async_replica in zip(DATABASE_REPLICA_URLS, replica_engines, async_replica_engines):
+    if "sqlite" in _url:
+        _enable_sqlite_pragmas([_replica, _async_replica.sync_engine], resolve_engine_options(_url))
+
+
+class SyncResultAdapter:
+    """Async iteration over a sync Result, mirroring AsyncResult.partitions()."""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def partitions(self, size=None):
+        for partition in self.result.partitions(size):
+            yield partition
+
+
+class SyncSessionAdapter:
+    """Exposes a sync Session with the awaitable API of AsyncSession.
+
+    Lets the services be written once against the AsyncSession interface while
+    still running on the blocking driver when DATABASE_ASYNC is disabled.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    @property
+    def bind(self):
+        return self.sync_session.bind
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, *args, **kwargs):
+        return self.sync_session.execute(statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return self.sync_session.scalar(statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        return self.sync_session.scalars(statement, *args, **kwargs)
+
+    async def stream_scalars(self, statement, *args, **kwargs):
+        return SyncResultAdapter(self.sync_session.scalars(statement, *args, **kwargs))
+
+    async def get(self, entity, ident, **kwargs):
+        return self.sync_session.get(entity, ident, **kwargs)
+
+    async def merge(self, instance, load=True):
+        return self.sync_session.merge(instance, load=load)
+
+    def expunge(self, instance):
+        self.sync_session.expunge(instance)
+
+    async def delete(self, instance):
+        self.sync_session.delete(instance)
+
+    async def flush(self, objects=None):
+        self.sync_session.flush(objects)
+
+    async def refresh(self, instance, attribute_names=None):
+        self.sync_session.refresh(instance, attribute_names)
+
+    async def commit(self):
+        self.sync_session.commit()
+
+    async def rollback(self):
+        self.sync_session.rollback()
+
+    async def close(self):
+        self.sync_session.close()
+
+
+# ==================== READ REPLICAS ====================
+# With DATABASE_REPLICA_URLS set, request sessions are RoutingSessions: SELECTs made
+# inside `replica_reads` service methods go to a replica, everything else to the
+# primary. Reads move back to the primary after the first write of the request,
+# and for DATABASE_STICKY_SECONDS after a write by the same client (cookie set
+# by ReadYourWritesMiddleware). Without replicas nothing changes.
+
+_read_route: ContextVar[Optional[str]] = ContextVar("read_route", default=None)
+
+
+def _route_reads(method, route: str):
+    if not DATABASE_REPLICA_URLS:
+        return method
+
+    # The outermost decorated method decides, so a write method's own lookups stay on the primary
+    if inspect.isasyncgenfunction(method):
+        @wraps(method)
+        async def generator_wrapper(*args, **kwargs):
+            generator = method(*args, **kwargs)
+            try:
+                while True:
+                    token = _read_route.set(_read_route.get() or route)
+                    try:
+                        item = await generator.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        _read_route.reset(token)
+                    yield item
+            finally:
+                await generator.aclose()
+        return generator_wrapper
+
+    @wraps(method)
+    async def wrapper(*args, **kwargs):
+        token = _read_route.set(_read_route.get() or route)
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            _read_route.reset(token)
+    return wrapper
+
+
+def replica_reads(method):
+    """Mark a read-only service method: its SELECTs may be served by a replica."""
+    return _route_reads(method, "replica")
+
+
+def primary_reads(method):
+    """Keep every read of this method (and of the methods it calls) on the primary."""
+    return _route_reads(method, "primary")
+
+
+class _StickyState:
+    __slots__ = ("primary_until", "wrote")
+
+    def __init__(self, primary_until: float):
+        self.primary_until = primary_until
+        self.wrote = False
+
+
+_sticky_state: ContextVar[Optional[_StickyState]] = ContextVar("db_sticky_state", default=None)
+
+
+class RoutingSession:
+    """AsyncSession-like router between the primary session and one replica session.
+
+    The replica session is opened on the first replica read. Objects loaded from
+    it can be merged into the primary for writes, like the cached users are.
+    """
+
+    def __init__(self, primary, replica_factory, *, pinned: bool = False):
+        self.primary = primary
+        self._replica_factory = replica_factory
+        self._replica = None
+        self.pinned = pinned
+        self.wrote = False
+        self.last_read_from_replica = False
+
+    @property
+    def bind(self):
+        return self.primary.bind
+
+    def _reader(self):
+        if self.pinned or _read_route.get() != "replica":
+            self.last_read_from_replica = False
+            return self.primary
+        if self._replica is None:
+            self._replica = self._replica_factory()
+        self.last_read_from_replica = True
+        return self._replica
+
+    def _writer(self):
+        # Read-your-writes: the rest of this request reads from the primary
+        self.pinned = self.wrote = True
+        return self.primary
+
+    def _for_statement(self, statement):
+        if isinstance(statement, Select) and statement._for_update_arg is None:
+            return self._reader()
+        return self._writer()
+
+    def _owner(self, instance):
+        if self._replica is not None and object_session(instance) is self._replica.sync_session:
+            return self._replica
+        return self.primary
+
+    def add(self, instance):
+        self._writer().add(instance)
+
+    def add_all(self, instances):
+        self._writer().add_all(instances)
+
+    async def execute(self, statement, *args, **kwargs):
+        return await self._for_statement(statement).execute(statement, *args, **kwargs)
+
+    async def scalar(self, statement, *args, **kwargs):
+        return await self._for_statement(statement).scalar(statement, *args, **kwargs)
+
+    async def scalars(self, statement, *args, **kwargs):
+        return await self._for_statement(statement).scalars(statement, *args, **kwargs)
+
+    async def stream_scalars(self, statement, *args, **kwargs):
+        return await self._for_statement(statement).stream_scalars(statement, *args, **kwargs)
+
+    async def get(self, entity, ident, **kwargs):
+        return await self._reader().get(entity, ident, **kwargs)
+
+    async def merge(self, instance, load=True):
+        return await self._writer().merge(instance, load=load)
+
+    def expunge(self, instance):
+        self._owner(instance).expunge(instance)
+
+    async def delete(self, instance):
+        await self._writer().delete(instance)
+
+    async def flush(self, objects=None):
+        await self._writer().flush(objects)
+
+    async def refresh(self, instance, attribute_names=None):
+        await self._owner(instance).refresh(instance, attribute_names)
+
+    async def commit(self):
+        await self.primary.commit()
+        if self._replica is not None:
+            # Ends the replica's read transaction; commit (unlike rollback) keeps loaded objects usable
+            await self._replica.commit()
+        state = _sticky_state.get()
+        if self.wrote and state is not None:
+            state.wrote = True
+
+    async def rollback(self):
+        await self.primary.rollback()
+
+    async def close(self):
+        if self._replica is not None:
+            await self._replica.close()
+        await self.primary.close()
+
+
+def read_from_replica(db) -> bool:
+    """True if the last read of `db` was served by a replica."""
+    return isinstance(db, RoutingSession) and db.last_read_from_replica
+
+
+def _open_replica_session():
+    if DATABASE_ASYNC:
+        return random.choice(AsyncReplicaSessionLocals)()
+    return SyncSessionAdapter(random.choice(ReplicaSessionLocals)())
+
+
+class ReadYourWritesMiddleware:
+    """Pure ASGI middleware pinning a client's reads to the primary for a while after it wrote."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        primary_until = 0.0
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                try:
+                    primary_until = float(cookie_parser(value.decode("latin-1")).get(DATABASE_STICKY_COOKIE, 0))
+                except ValueError:
+                    pass
+                break
+        state = _StickyState(primary_until)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and state.wrote:
+                cookie = (
+                    f"{DATABASE_STICKY_COOKIE}={time.time() + DATABASE_STICKY_SECONDS:.3f}; "
+                    f"Max-Age={math.ceil(DATABASE_STICKY_SECONDS)}; Path=/; HttpOnly; SameSite=Lax"
+                )
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        token = _sticky_state.set(state)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _sticky_state.reset(token)
+
+
+@asynccontextmanager
+async def session_scope(*, read_only: bool = False):
+    """Session for work outside a request (startup, background tasks, CLI).
+
+    `read_only=True` uses a replica when one is configured.
+    """
+    if read_only and DATABASE_REPLICA_URLS:
+        db = _open_replica_session()
+        try:
+            yield db
+        finally:
+            await db.close()
+    elif DATABASE_ASYNC:
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield SyncSessionAdapter(db)
+        finally:
+            db.close()
+
+
+async def get_db():
+    async with session_scope() as db:
+        if not DATABASE_REPLICA_URLS:
+            yield db
+            return
+        state = _sticky_state.get()
+        pinned = state is not None and state.primary_until > time.time()
+        db = RoutingSession(db, _open_replica_session, pinned=pinned)
+        try:
+            yield db
+        finally:
+            if db._replica is not None:
+                await db._replica.close()
@@ -1,22 +1,77 @@
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials
-from services.tokens_service import bearer_scheme, get_token_service, TokenService
+from services.tokens_service import (
+    bearer_scheme, get_token_service, TokenService, user_version_key, ACCESS_TOKEN_CLAIMS,
+)
 from services.users_services import UserService, get_user_service
 from models.users_models import User, UserRole
-from typing import Annotated
+from typing import Annotated, Optional
+from uuid import UUID
 from fastapi import status
 
 
-async def get_current_user(
+class Principal:
+    """The authenticated user as far as authorization needs it; no ORM row behind it."""
+
+    __slots__ = ("id", "email", "role", "disabled")
+
+    def __init__(self, id: UUID, email: str, role: UserRole, disabled: bool = False):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.disabled = disabled
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> Optional["Principal"]:
+        """None for tokens issued without the user claims."""
+        if "uid" not in payload or "rv" not in payload:
+            return None
+        try:
+            return cls(UUID(payload["uid"]), payload["sub"], UserRole(payload["role"]), bool(payload.get("dis")))
+        except (KeyError, ValueError):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token claims")
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user.id, user.email, UserRole(user.role), user.disabled)
+
+    @property
+    def is_active(self) -> bool:
+        return not self.disabled
+
+
+async def get_current_principal(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    user_service: UserService = Depends(get_user_service)
+    token_service: TokenService = Depends(get_token_service),
+    user_service: UserService = Depends(get_user_service),
+) -> Principal:
+    token_data = token_service.validate_access_token(credentials.credentials)
+    principal = Principal.from_claims(token_data) if ACCESS_TOKEN_CLAIMS else None
+    if principal is not None:
+        # Answered by the in-memory revocation filter; the DB is only asked about filter hits
+        if await token_service.is_blacklisted(user_version_key(principal.id, token_data["rv"])):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+        return principal
+
+    # Tokens without claims: authorize from the (cached) user row
+    user = await user_service.get_cached_user_by_email(email=token_data.get("sub"))
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token subject")
+    return Principal.from_user(user)
+
+async def get_current_active_principal(
+    principal: Annotated[Principal, Depends(get_current_principal)],
+) -> Principal:
+    if principal.disabled:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return principal
+
+async def get_current_user(
+    principal: Annotated[Principal, Depends(get_current_principal)],
+    user_service: UserService = Depends(get_user_service),
 ):
-    token = credentials.credentials
-    token_service: TokenService = get_token_service()
-    token_data = token_service.validate_access_token(token)
-    email = token_data.get("sub")
-    
-    user = user_service.get_user_by_email(email=email)
+    """The full user row, for routes that need profile data."""
+    user = await user_service.get_cached_user(principal.id)
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token subject")
     return user
@@ -29,8 +84,8 @@ async def get_current_active_user(
     return current_user
 
 async def get_current_active_admin_user(
-    current_user: Annotated[User, Depends(get_current_user)],
-):
-    if current_user.role != UserRole.ADMIN:
+    principal: Annotated[Principal, Depends(get_current_principal)],
+) -> Principal:
+    if principal.role != UserRole.ADMIN:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin user required")
-    return current_user
\ No newline at end of file
+    return principal
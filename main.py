@@ -1,18 +1,173 @@
+import time
+
+_IMPORT_STARTED = time.perf_counter()
+
+from contextlib import asynccontextmanager, contextmanager
 from fastapi import FastAPI
-import os
+from fastapi.responses import ORJSONResponse
+from typing import Optional
+import asyncio
+import logging
 
-from starlette.middleware.sessions import SessionMiddleware
+from settings import Settings, get_settings
 from routes.users_routes import users_router
 from routes.auth_routes import auth_router
-from utils.email_utlis import email_router
-from database import create_db_and_tables
+from routes.jwks_routes import well_known_router
+from routes.metrics_routes import metrics_router
+from utils.email_utlis import email_router, close_smtp_pool, load_magic_link_template, get_ssl_context, SMTP_STARTTLS
+from utils.auth_google_utils import get_google_oidc, close_google_oidc
+from utils.metrics_utils import MetricsMiddleware, instrument_engine
+from database import (
+    create_db_and_tables,
+    session_scope,
+    warm_pool,
+    dispose_engines,
+    engine,
+    async_engine,
+    replica_engines,
+    async_replica_engines,
+    ReadYourWritesMiddleware,
+)
+from services.revocation_service import revocation_filter
+from services.blocklist_service import run_blocklist_purge_loop
+from services.outbox_service import run_outbox_worker
+from services.activity_service import activity_buffer, run_activity_flush_loop
+from services.keys_service import key_ring, is_asymmetric, run_key_rotation_loop
+from services.users_services import UserService
+
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== STARTUP ====================
+
+class StartupReport:
+    """Wall time of each startup step, in milliseconds."""
+
+    def __init__(self):
+        self.steps: dict[str, float] = {"imports": round(IMPORT_SECONDS * 1000, 2)}
+
+    @contextmanager
+    def step(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = round((time.perf_counter() - start) * 1000, 2)
+
+    @property
+    def total_ms(self) -> float:
+        return round(sum(self.steps.values()), 2)
+
+    def as_dict(self) -> dict:
+        return {"steps_ms": dict(self.steps), "total_ms": self.total_ms}
+
+
+async def warmup(settings: Settings, report: StartupReport) -> None:
+    """Do the one-off work up front so the first requests do not pay for it."""
+    if settings.create_tables:
+        with report.step("create_tables"):
+            create_db_and_tables()
+
+    with report.step("db_pool"):
+        await warm_pool(settings.warmup_db_connections)
+
+    if settings.revocation_filter:
+        with report.step("revocation_filter"):
+            async with session_scope() as db:
+                await revocation_filter.load(db)
+
+    if is_asymmetric(key_ring.algorithm):
+        with report.step("signing_keys"):
+            key_ring.rotate_if_due()
+            key_ring.signing_key()
+            key_ring.jwks()
+
+    if settings.warmup_user_cache > 0:
+        with report.step("user_cache"):
+            async with session_scope() as db:
+                await UserService(db).preload_user_cache(settings.warmup_user_cache)
+
+    with report.step("email"):
+        load_magic_link_template()
+        if SMTP_STARTTLS:
+            get_ssl_context()
+
+    if settings.warmup_oidc and settings.google_client_id:
+        with report.step("oidc"):
+            try:
+                await get_google_oidc().warmup()
+            except Exception as e:
+                # Not fatal: metadata and keys are fetched again on the first login
+                logger.warning("OIDC warmup failed: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings: Settings = app.state.settings
+    report = StartupReport()
+    await warmup(settings, report)
+    app.state.startup_report = report.as_dict()
+    logger.info(
+        "Startup finished in %.1f ms (%s)",
+        report.total_ms,
+        ", ".join(f"{name} {ms:.1f} ms" for name, ms in report.steps.items()),
+    )
+
+    background_tasks = []
+    if settings.blocklist_purge_interval_seconds > 0:
+        background_tasks.append(asyncio.create_task(
+            run_blocklist_purge_loop(interval_seconds=settings.blocklist_purge_interval_seconds)
+        ))
+    if settings.email_outbox_in_app:
+        background_tasks.append(asyncio.create_task(run_outbox_worker()))
+    background_tasks.append(asyncio.create_task(
+        run_activity_flush_loop(interval_seconds=settings.activity_flush_interval_seconds)
+    ))
+    if is_asymmetric(key_ring.algorithm) and settings.jwt_key_rotation_days > 0:
+        background_tasks.append(asyncio.create_task(run_key_rotation_loop()))
+
+    yield
+
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    # Last write of buffered login activity, while the engines are still open
+    await activity_buffer.flush()
+    await close_smtp_pool()
+    await close_google_oidc()
+    await dispose_engines()
+
+
+# ==================== APP FACTORY ====================
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Build the app without touching the database; all I/O happens in the lifespan."""
+    settings = settings or get_settings()
+
+    # Routes without a precompiled serializer still skip the stdlib json encoder
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+    app.state.settings = settings
 
-create_db_and_tables()
+    if replica_engines:
+        app.add_middleware(ReadYourWritesMiddleware)
+    if settings.metrics_enabled:
+        instrument_engine(engine, "sync")
+        instrument_engine(async_engine.sync_engine, "async")
+        for index, (replica, async_replica) in enumerate(zip(replica_engines, async_replica_engines)):
+            instrument_engine(replica, f"replica{index}_sync")
+            instrument_engine(async_replica.sync_engine, f"replica{index}_async")
+        # Added last so it is outermost and times the whole middleware stack
+        app.add_middleware(MetricsMiddleware)
 
-app = FastAPI()
+    app.include_router(auth_router)
+    app.include_router(users_router)
+    app.include_router(email_router)
+    app.include_router(well_known_router)
+    if settings.metrics_enabled:
+        app.include_router(metrics_router)
+    return app
 
-app.add_middleware(SessionMiddleware, secret_key=os.getenv("SECRET_KEY"))
 
-app.include_router(auth_router)
-app.include_router(users_router)
-app.include_router(email_router)
\ No newline at end of file
+app = create_app()
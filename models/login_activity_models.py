@@ -0,0 +1,27 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, DateTime, ForeignKey, Index
+from typing import Optional
+from uuid import UUID
+from datetime import datetime
+import uuid
+
+from models.users_models import Base
+
+
+class LoginActivity(Base):
+    """One successful login; written in batches by the activity buffer."""
+
+    __tablename__ = "login_activity"
+
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid.uuid4, nullable=False)
+    user_id: Mapped[UUID] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    provider: Mapped[str] = mapped_column(String(20), nullable=False)
+    ip_address: Mapped[Optional[str]] = mapped_column(String(45), nullable=True)
+    logged_in_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("idx_login_activity_user_time", "user_id", "logged_in_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<LoginActivity(user_id='{self.user_id}', provider='{self.provider}')>"
@@ -0,0 +1,21 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Text, Float, Index
+
+from models.users_models import Base
+
+
+class OAuthState(Base):
+    """Pending authorization request of an OAuth flow (`OAUTH_STATE_BACKEND=database`)."""
+
+    __tablename__ = "oauth_states"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    data: Mapped[str] = mapped_column(Text, nullable=False)
+    expires_at: Mapped[float] = mapped_column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("idx_oauth_states_expires_at", "expires_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<OAuthState(key='{self.key}')>"
@@ -0,0 +1,23 @@
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import String, Integer, BigInteger, Float, Index
+
+from models.users_models import Base
+
+
+class RateLimitCounter(Base):
+    """Sliding-window counter shared by all workers (`RATE_LIMIT_BACKEND=database`)."""
+
+    __tablename__ = "rate_limit_counters"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    window_start: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    prev_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    expires_at: Mapped[float] = mapped_column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("idx_rate_limit_expires_at", "expires_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<RateLimitCounter(key='{self.key}', count={self.count})>"
@@ -31,6 +31,7 @@ class TokenBlocklist(Base):
     __table_args__ = (
         Index("idx_blocklist_jti", "jti"),
         Index("idx_blocklist_expires_at", "expires_at"),
+        Index("idx_blocklist_created_at", "created_at"),
     )
 
     def __repr__(self) -> str:
@@ -1,6 +1,6 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from datetime import datetime, timezone
-from sqlalchemy import String, Boolean, Text, DateTime, func
+from sqlalchemy import String, Boolean, Integer, Text, DateTime, func
 from typing import Optional
 from uuid import UUID
 from enum import Enum
@@ -41,6 +41,8 @@ class User(Base):
     picture: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     disabled: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     role: Mapped[UserRole] = mapped_column(String(20), default=UserRole.USER, nullable=False)
+    # Embedded in access tokens as `rv`; bumping it revokes the user's outstanding claims tokens
+    token_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), 
         server_default=func.now(),
@@ -60,6 +62,10 @@ class User(Base):
         passive_deletes=True,
     ) 
 
+    __table_args__ = (
+        Index("idx_users_created_at_id", "created_at", "id"),
+    )
+
     def __repr__(self) -> str:
         """Representación legible del objeto."""
         return f"<User(id={self.id}, email='{self.email}', email='{self.email}')>"
@@ -1,46 +1,57 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime, timezone
 from starlette.requests import Request
 from authlib.integrations.starlette_client import OAuthError
 import os
 
-from utils.email_utlis import send_verification_email
 from utils.auth_google_utils import oauth_google_authorize_redirect, oauth_google_authorize_access_token
 from services.tokens_service import (
     get_token_service,
     TokenService,
     TokenPair,
+    token_pair_serializer,
     bearer_scheme,
+    access_token_data,
+    ACCESS_TOKEN_CLAIMS,
 )
 from services.users_services import get_user_service, UserService
+from services.outbox_service import get_outbox_service, OutboxService
+from services.rate_limit_service import limit_login, limit_refresh, client_ip
+from services.activity_service import activity_buffer
 from fastapi.security import HTTPAuthorizationCredentials
 from models.token_models import TokenType
-from models.users_models import User
+from models.users_models import User, AuthProviderType
 
 auth_router = APIRouter(prefix="/auth", tags=["auth"])
 
 # ==================== EMAIL AUTHENTICATION ====================
 
-@auth_router.post("/login")
+@auth_router.post("/login", dependencies=[Depends(limit_login)])
 async def send_token(
     email: str,
-    background_tasks: BackgroundTasks,
     user_service: UserService = Depends(get_user_service),
     token_service: TokenService = Depends(get_token_service),
+    outbox_service: OutboxService = Depends(get_outbox_service),
 ):
-    user = user_service.get_user_by_email(email)
+    user = await user_service.get_user_by_email(email, with_social_accounts=False)
     if not user:
         user = User(email=email)
-        user = user_service.create_user(user)
+        user = await user_service.create_user(user)
 
     token = token_service.create_email_verification_token(data={"sub": user.email})
-    background_tasks.add_task(send_verification_email, email, token)
+    # Delivered by the outbox worker (in-app or `python cli.py outbox-worker`)
+    await outbox_service.enqueue_verification_email(email, token)
 
     return {"message": "Verification code sent", "email": email}
 
 
-@auth_router.get("/verify-token/")
-async def verify_email_token(token: str, token_service: TokenService = Depends(get_token_service)):
+@auth_router.get("/verify-token/", response_model=TokenPair)
+async def verify_email_token(
+    request: Request,
+    token: str,
+    user_service: UserService = Depends(get_user_service),
+    token_service: TokenService = Depends(get_token_service),
+):
     payload = token_service.validate_email_verified_token(token)
     if not payload:
         raise HTTPException(
@@ -51,38 +62,39 @@ async def verify_email_token(token: str, token_service: TokenService = Depends(g
 
     email = payload.get("sub")
     data = {"sub": email}
-    access_token = token_service.create_access_token(data=data)
-    refresh_token = token_service.create_refresh_token(data=data)
-    return TokenPair(access_token=access_token, refresh_token=refresh_token, token_type="bearer")
+    access_data = data
+    if ACCESS_TOKEN_CLAIMS:
+        user = await user_service.get_cached_user_by_email(email)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token subject")
+        access_data = access_token_data(user)
+    access_token, refresh_token = token_service.issue_pair(access_data, data)
+    activity_buffer.record_login(email, AuthProviderType.EMAIL.value, client_ip(request))
+    return token_pair_serializer.response(
+        TokenPair(access_token=access_token, refresh_token=refresh_token, token_type="bearer")
+    )
 
 
-@auth_router.post("/refresh")
+@auth_router.post("/refresh", response_model=TokenPair, dependencies=[Depends(limit_refresh)])
 async def refresh_tokens(
     refresh_token: str,
     user_service: UserService = Depends(get_user_service),
     token_service: TokenService = Depends(get_token_service),
 ):
 
-    payload = token_service.validate_refresh_token(refresh_token)
+    # Revocation is decided by the rotation insert itself, not by a prior read
+    payload = token_service.decode_refresh_token(refresh_token)
     email = payload.get("sub")
-    old_jti = payload["jti"]
-    user = user_service.get_user_by_email(email)
+    user = await user_service.get_cached_user_by_email(email)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token subject")
 
-    # Rotate refresh token: blacklist the old refresh jti
-    token_service.blacklist_token(
-        jti=old_jti,
-        token_type=TokenType.REFRESH,
-        user_id=user.id,
-        expires_at=datetime.fromtimestamp(payload["exp"]),
-        reason="rotated",
-    )
-
-    access_token = token_service.create_access_token(data={"sub": user.email})
-    new_refresh_token = token_service.create_refresh_token(data={"sub": user.email})
+    new_refresh_token = await token_service.rotate_refresh_token(payload, user_id=user.id)
+    access_token = token_service.create_access_token(data=access_token_data(user))
 
-    return TokenPair(access_token=access_token, refresh_token=new_refresh_token, token_type="bearer")
+    return token_pair_serializer.response(
+        TokenPair(access_token=access_token, refresh_token=new_refresh_token, token_type="bearer")
+    )
 
 
 @auth_router.post("/logout")
@@ -99,20 +111,20 @@ async def logout(
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid access token")
 
-    user = user_service.get_user_by_email(email)
+    user = await user_service.get_user_by_email(email, with_social_accounts=False)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token subject")
 
     if refresh_token:
-        payload_r = token_service.validate_refresh_token(refresh_token)
+        payload_r = await token_service.validate_refresh_token(refresh_token)
         r_jti = payload_r.get("jti")
         r_exp = payload_r.get("exp")
         if r_jti:
-            token_service.blacklist_token(
+            await token_service.blacklist_token(
                 jti=r_jti,
                 token_type=TokenType.REFRESH,
                 user_id=user.id,
-                expires_at=datetime.fromtimestamp(r_exp),
+                expires_at=datetime.fromtimestamp(r_exp, timezone.utc),
                 reason="logout",
             )
 
@@ -125,7 +137,7 @@ async def login_via_google(request: Request):
     redirect_uri = request.url_for('callback_via_google')
     return await oauth_google_authorize_redirect(request, redirect_uri)
 
-@auth_router.get("/google/callback")
+@auth_router.get("/google/callback", response_model=TokenPair)
 async def callback_via_google(request: Request, user_service: UserService = Depends(get_user_service)):
     """
     Callback function for Google OAuth
@@ -147,6 +159,8 @@ async def callback_via_google(request: Request, user_service: UserService = Depe
     if not token:
         raise HTTPException(status_code=400, detail="No token returned from Google")
     
-    access_token, refresh_token = user_service.process_google_login(token['userinfo'])
+    access_token, refresh_token = await user_service.process_google_login(token['userinfo'], client_ip(request))
 
-    return TokenPair(access_token=access_token, refresh_token=refresh_token, token_type="bearer")
+    return token_pair_serializer.response(
+        TokenPair(access_token=access_token, refresh_token=refresh_token, token_type="bearer")
+    )
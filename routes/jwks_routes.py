@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from starlette.requests import Request
+from starlette.responses import Response
+
+from services.keys_service import key_ring, JWKS_MAX_AGE_SECONDS
+
+well_known_router = APIRouter(prefix="/.well-known", tags=["jwks"])
+
+
+@well_known_router.get("/jwks.json")
+async def get_jwks(request: Request):
+    """Public signing keys so other services can verify our JWTs locally."""
+    body, etag = key_ring.jwks()
+    headers = {"Cache-Control": f"public, max-age={JWKS_MAX_AGE_SECONDS}", "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,62 +1,193 @@
-from fastapi import Depends, APIRouter, HTTPException, status
+from fastapi import Depends, APIRouter, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from collections import Counter
 from typing import Annotated
-from dependencies import get_current_active_user, get_current_active_admin_user
-from schemas.users_schemas import UserUpdate, UserResponse, UserSocialAccountBase
-from services.users_services import UserService, get_user_service
+from dependencies import get_current_active_user, get_current_active_admin_user, Principal
+from database import session_scope
+from schemas.users_schemas import (
+    UserUpdate,
+    UserResponse,
+    UserSummary,
+    UserSocialAccountBase,
+    UserPage,
+    BulkResult,
+    BulkItemStatus,
+    user_serializer,
+    user_summary_serializer,
+    user_page_serializer,
+    social_accounts_serializer,
+    bulk_result_serializer,
+)
+from services.users_services import UserService, get_user_service, USERS_PAGE_SIZE, USERS_PAGE_MAX_SIZE
 from uuid import UUID
-from models.users_models import User
+from models.users_models import User, UserRole
+from utils.bulk_utils import read_bulk_records
 
 users_router = APIRouter(prefix="/users", tags=["users"])
 
-@users_router.get("/")
+async def _stream_users_ndjson():
+    # The request session is closed before a streaming body is sent, so use a dedicated one
+    async with session_scope(read_only=True) as db:
+        async for user in UserService(db).stream_users():
+            yield user_serializer.dump_json(user) + b"\n"
+
+@users_router.get("/", response_model=UserPage)
 async def get_all_users(
     # current_admin_user: Annotated[UserBase, Depends(get_current_active_admin_user)],
+    limit: int = Query(USERS_PAGE_SIZE, ge=1, le=USERS_PAGE_MAX_SIZE),
+    cursor: str | None = None,
+    stream: bool = False,
     user_service: UserService = Depends(get_user_service)
 ):
-    return user_service.get_all_users()
+    """
+    List active users ordered by creation.
+
+    Returns pages of `limit` users; pass `next_cursor` back as `cursor` for the next page.
+    With `stream=true`, every active user is streamed as NDJSON instead.
+    """
+    if stream:
+        return StreamingResponse(_stream_users_ndjson(), media_type="application/x-ndjson")
+    try:
+        users, next_cursor = await user_service.get_users_page(limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return user_page_serializer.response({"items": users, "next_cursor": next_cursor})
+
+# ==================== BULK ADMINISTRATION ====================
+
+BULK_ERROR_STATUSES = {BulkItemStatus.INVALID, BulkItemStatus.DUPLICATE, BulkItemStatus.NOT_FOUND, BulkItemStatus.FAILED}
+
+_BULK_BODY_TYPES = ("application/json", "application/x-ndjson", "text/csv")
+_IDS_BODY = "User ids: a JSON array of ids, NDJSON/CSV rows with an `id` field."
+
+def _bulk_openapi(description: str) -> dict:
+    # The body is read as a stream, so it is documented here instead of as a parameter
+    return {
+        "requestBody": {
+            "required": True,
+            "description": description,
+            "content": {content_type: {"schema": {}} for content_type in _BULK_BODY_TYPES},
+        }
+    }
+
+async def _bulk_records(request: Request):
+    try:
+        return await read_bulk_records(request)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def _bulk_result(items: list[dict], errors_only: bool):
+    counts = Counter(item["status"] for item in items)
+    if errors_only:
+        items = [item for item in items if item["status"] in BULK_ERROR_STATUSES]
+    return bulk_result_serializer.response({"total": sum(counts.values()), "counts": counts, "items": items})
+
+@users_router.post(
+    "/bulk/import",
+    response_model=BulkResult,
+    openapi_extra=_bulk_openapi(
+        "Users: a JSON array, NDJSON or CSV with `email` and optional "
+        "`full_name`, `given_name`, `family_name`, `picture`, `disabled`, `role`."
+    ),
+)
+async def bulk_import_users(
+    request: Request,
+    current_admin_user: Annotated[Principal, Depends(get_current_active_admin_user)],
+    update_existing: bool = False,
+    errors_only: bool = False,
+    user_service: UserService = Depends(get_user_service),
+):
+    """
+    Create users in chunked transactions, with one result per input item.
+
+    Existing emails are reported as `exists`, or with `update_existing=true` get
+    the non-empty fields of the item. `errors_only=true` leaves successful items
+    out of `items` (they are still counted).
+    """
+    records = await _bulk_records(request)
+    items = await user_service.bulk_import_users(records, update_existing=update_existing)
+    return _bulk_result(items, errors_only)
+
+@users_router.post("/bulk/disable", response_model=BulkResult, openapi_extra=_bulk_openapi(_IDS_BODY))
+async def bulk_disable_users(
+    request: Request,
+    current_admin_user: Annotated[Principal, Depends(get_current_active_admin_user)],
+    disabled: bool = True,
+    errors_only: bool = False,
+    user_service: UserService = Depends(get_user_service),
+):
+    """Disable (or with `disabled=false`, re-enable) users by id."""
+    records = await _bulk_records(request)
+    return _bulk_result(await user_service.bulk_set_disabled(records, disabled), errors_only)
+
+@users_router.post("/bulk/role", response_model=BulkResult, openapi_extra=_bulk_openapi(_IDS_BODY))
+async def bulk_set_user_role(
+    request: Request,
+    role: UserRole,
+    current_admin_user: Annotated[Principal, Depends(get_current_active_admin_user)],
+    errors_only: bool = False,
+    user_service: UserService = Depends(get_user_service),
+):
+    """Set the role of users by id."""
+    records = await _bulk_records(request)
+    return _bulk_result(await user_service.bulk_set_role(records, role), errors_only)
+
+@users_router.post("/bulk/delete", response_model=BulkResult, openapi_extra=_bulk_openapi(_IDS_BODY))
+async def bulk_delete_users(
+    request: Request,
+    current_admin_user: Annotated[Principal, Depends(get_current_active_admin_user)],
+    errors_only: bool = False,
+    user_service: UserService = Depends(get_user_service),
+):
+    """Delete users (and their social accounts) by id."""
+    records = await _bulk_records(request)
+    return _bulk_result(await user_service.bulk_delete_users(records), errors_only)
 
 @users_router.get("/email/{email}", response_model=UserResponse)
 async def get_user_by_email(
     email: str,
     user_service: UserService = Depends(get_user_service),
 ):
-    return user_service.get_user_by_email(email)
+    user = await user_service.get_user_by_email(email)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return user_serializer.response(user)
 
-@users_router.get("/{user_id}")
+@users_router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: UUID,
     user_service: UserService = Depends(get_user_service),
 ):
-    user = user_service.get_user(user_id)
+    user = await user_service.get_user(user_id, with_social_accounts=True)
     if user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return user
+    return user_serializer.response(user)
 
-@users_router.delete("/{user_id}")
+@users_router.delete("/{user_id}", response_model=UserSummary)
 async def delete_user(
     user_id: UUID,
     user_service: UserService = Depends(get_user_service),
 ):
-    user = user_service.get_user(user_id)
+    user = await user_service.get_user(user_id)
     if user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return user_service.delete_user(user)
+    return user_summary_serializer.response(await user_service.delete_user(user))
 
-@users_router.patch("/{user_id}/admin")
+@users_router.patch("/{user_id}/admin", response_model=UserSummary)
 async def make_user_admin(
     user_id: UUID,
     user_service: UserService = Depends(get_user_service),
 ):
-    user = user_service.get_user(user_id)
+    user = await user_service.get_user(user_id)
     if user is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return user_service.make_user_admin(user)
+    return user_summary_serializer.response(await user_service.make_user_admin(user))
 
 @users_router.get("/me/", response_model=UserResponse)
 async def read_users_me(
     current_user: Annotated[User, Depends(get_current_active_user)],
 ):
-    return current_user
+    return user_serializer.response(current_user)
 
 @users_router.patch("/me/", response_model=UserResponse)
 async def update_user(
@@ -64,11 +195,11 @@ async def update_user(
     current_user: Annotated[User, Depends(get_current_active_user)],
     user_service: UserService = Depends(get_user_service),
 ):
-    return user_service.update_user(current_user, user)
+    return user_serializer.response(await user_service.update_user(current_user, user))
 
 @users_router.get("/me/social-accounts/", response_model=list[UserSocialAccountBase])
 async def get_user_social_accounts(
     current_user: Annotated[User, Depends(get_current_active_user)],
     user_service: UserService = Depends(get_user_service),
 ):
-    return user_service.get_user_social_accounts(current_user)
\ No newline at end of file
+    return social_accounts_serializer.response(await user_service.get_user_social_accounts(current_user))
\ No newline at end of file
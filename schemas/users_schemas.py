@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+from enum import Enum
 from models.users_models import AuthProviderType, UserRole
 from uuid import UUID
+from utils.serialization_utils import Serializer
 
 class UserBase(BaseModel):
     email: str
@@ -29,8 +31,56 @@ class UserSocialAccountBase(BaseModel):
     email: str | None = None
     picture: str | None = None
 
-class UserResponse(UserBase):
+class UserSummary(UserBase):
     id: UUID
     created_at: datetime
     updated_at: datetime
+
+class UserResponse(UserSummary):
     social_accounts: list[UserSocialAccountBase] | None = None
+
+class UserPage(BaseModel):
+    items: list[UserResponse]
+    next_cursor: str | None = None
+
+# ==================== BULK ADMINISTRATION ====================
+
+class UserImport(BaseModel):
+    # Lengths match the columns, so one oversized value fails its item and not the whole chunk
+    email: str = Field(min_length=3, max_length=255)
+    full_name: str | None = Field(None, max_length=200)
+    given_name: str | None = Field(None, max_length=100)
+    family_name: str | None = Field(None, max_length=100)
+    picture: str | None = Field(None, max_length=500)
+    disabled: bool | None = None
+    role: UserRole | None = None
+
+class BulkItemStatus(str, Enum):
+    CREATED = "created"
+    EXISTS = "exists"
+    UPDATED = "updated"
+    DELETED = "deleted"
+    NOT_FOUND = "not_found"
+    DUPLICATE = "duplicate"
+    INVALID = "invalid"
+    FAILED = "failed"
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: BulkItemStatus
+    id: UUID | None = None
+    email: str | None = None
+    detail: str | None = None
+
+class BulkResult(BaseModel):
+    total: int
+    counts: dict[BulkItemStatus, int]
+    items: list[BulkItemResult]
+
+# ==================== SERIALIZERS ====================
+
+user_serializer = Serializer(UserResponse)
+user_summary_serializer = Serializer(UserSummary)
+user_page_serializer = Serializer(UserPage)
+social_accounts_serializer = Serializer(list[UserSocialAccountBase])
+bulk_result_serializer = Serializer(BulkResult)
@@ -0,0 +1,158 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, insert, or_, select, update
+
+from database import session_scope
+from models.login_activity_models import LoginActivity
+from models.users_models import User, UserSocialAccount
+from utils.metrics_utils import ACTIVITY_DROPPED, ACTIVITY_FLUSH_DURATION
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Pending entries (coalesced `last_used` values + login events) kept between flushes; new ones are dropped beyond this
+ACTIVITY_BUFFER_MAX_ENTRIES = int(os.getenv("ACTIVITY_BUFFER_MAX_ENTRIES", "10000"))
+# Flush before the interval is up once this many entries are pending
+ACTIVITY_FLUSH_BATCH_SIZE = int(os.getenv("ACTIVITY_FLUSH_BATCH_SIZE", "1000"))
+
+_accounts = UserSocialAccount.__table__
+_logins = LoginActivity.__table__
+_users = User.__table__
+
+# executemany statements; `last_used` only moves forward, whichever worker flushes last
+_TOUCH_ACCOUNT = (
+    update(_accounts)
+    .where(
+        _accounts.c.provider == bindparam("b_provider"),
+        _accounts.c.provider_id == bindparam("b_provider_id"),
+        or_(_accounts.c.last_used.is_(None), _accounts.c.last_used < bindparam("b_at", type_=_accounts.c.last_used.type)),
+    )
+    # Keeps `updated_at` (onupdate) for profile changes, not logins
+    .values(last_used=bindparam("b_at", type_=_accounts.c.last_used.type), updated_at=_accounts.c.updated_at)
+)
+# Resolves the user by email at flush time; logins of users deleted meanwhile insert nothing
+_INSERT_LOGIN = insert(_logins).from_select(
+    ["id", "user_id", "provider", "ip_address", "logged_in_at"],
+    select(
+        bindparam("b_id", type_=_logins.c.id.type),
+        _users.c.id,
+        bindparam("b_provider", type_=_logins.c.provider.type),
+        bindparam("b_ip", type_=_logins.c.ip_address.type),
+        bindparam("b_at", type_=_logins.c.logged_in_at.type),
+    ).where(_users.c.email == bindparam("b_email")),
+)
+
+
+class ActivityBuffer:
+    """Write-behind buffer for login bookkeeping.
+
+    `last_used` timestamps are coalesced per social account (the newest wins)
+    and login events are queued, so a login only touches memory. `flush`
+    writes everything in one transaction with one executemany statement per
+    kind. At most `max_entries` are held; past that, new entries are dropped
+    and counted in `activity_entries_dropped`.
+    """
+
+    def __init__(self, max_entries: int = ACTIVITY_BUFFER_MAX_ENTRIES, batch_size: int = ACTIVITY_FLUSH_BATCH_SIZE):
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self._last_used: dict[tuple[str, str], datetime] = {}
+        self._logins: list[dict] = []
+        self._full = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._last_used) + len(self._logins)
+
+    def _admit(self, new_entry: bool) -> bool:
+        if new_entry and len(self) >= self.max_entries:
+            ACTIVITY_DROPPED.inc()
+            return False
+        if len(self) + new_entry >= self.batch_size:
+            self._full.set()
+        return True
+
+    def touch_account(self, provider: str, provider_id: str, at: Optional[datetime] = None) -> None:
+        key = (provider, provider_id)
+        previous = self._last_used.get(key)
+        if not self._admit(previous is None):
+            return
+        at = at or datetime.now(timezone.utc)
+        if previous is None or at > previous:
+            self._last_used[key] = at
+
+    def record_login(self, email: str, provider: str, ip_address: Optional[str], at: Optional[datetime] = None) -> None:
+        if not self._admit(True):
+            return
+        self._logins.append({
+            "b_id": uuid.uuid4(),
+            "b_email": email,
+            "b_provider": provider,
+            "b_ip": ip_address,
+            "b_at": at or datetime.now(timezone.utc),
+        })
+
+    async def wait_full(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Each app lifespan (tests, benchmarks) may run in a new event loop
+            self._loop = loop
+            self._full = asyncio.Event()
+            if len(self) >= self.batch_size:
+                self._full.set()
+        await self._full.wait()
+
+    async def flush(self) -> int:
+        """Write and clear the pending entries; on failure they are put back (as far as they fit)."""
+        async with self._flush_lock:
+            last_used, self._last_used = self._last_used, {}
+            logins, self._logins = self._logins, []
+            self._full.clear()
+            if not last_used and not logins:
+                return 0
+            start = time.perf_counter()
+            try:
+                async with session_scope() as db:
+                    if last_used:
+                        await db.execute(_TOUCH_ACCOUNT, [
+                            {"b_provider": provider, "b_provider_id": provider_id, "b_at": at}
+                            for (provider, provider_id), at in last_used.items()
+                        ])
+                    if logins:
+                        await db.execute(_INSERT_LOGIN, logins)
+                    await db.commit()
+            except Exception:
+                logger.exception("Flushing %d activity entries failed", len(last_used) + len(logins))
+                for (provider, provider_id), at in last_used.items():
+                    self.touch_account(provider, provider_id, at)
+                for login in logins:
+                    if self._admit(True):
+                        self._logins.append(login)
+                return 0
+            finally:
+                ACTIVITY_FLUSH_DURATION.observe(time.perf_counter() - start)
+            return len(last_used) + len(logins)
+
+
+activity_buffer = ActivityBuffer()
+
+
+async def run_activity_flush_loop(interval_seconds: float) -> None:
+    """Background task for the app lifespan: flush every `interval_seconds`, or early once a batch is pending."""
+    while True:
+        try:
+            await asyncio.wait_for(activity_buffer.wait_full(), timeout=interval_seconds)
+        except asyncio.TimeoutError:
+            pass
+        # Shielded so cancelling the loop at shutdown does not lose a flush in progress
+        await asyncio.shield(activity_buffer.flush())
@@ -0,0 +1,111 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+import asyncio
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from sqlalchemy import select, delete, func, text
+
+from database import session_scope
+from models.token_models import TokenBlocklist
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BLOCKLIST_PURGE_BATCH_SIZE = int(os.getenv("BLOCKLIST_PURGE_BATCH_SIZE", "1000"))
+# Interval of the in-app purge task; 0 disables it (use `python cli.py purge-blocklist` instead)
+BLOCKLIST_PURGE_INTERVAL_SECONDS = float(os.getenv("BLOCKLIST_PURGE_INTERVAL_SECONDS", "3600"))
+
+
+class BlocklistPurgeReport(BaseModel):
+    rows_purged: int
+    batches: int
+    batch_latency_ms_avg: float
+    batch_latency_ms_max: float
+    duration_ms: float
+    table_rows: int
+    table_bytes: Optional[int] = None
+
+
+async def blocklist_table_bytes(db) -> Optional[int]:
+    """On-disk size of token_blocklist and its indexes, if the backend can report it."""
+    dialect = db.bind.dialect.name
+    try:
+        if dialect == "postgresql":
+            return await db.scalar(text("SELECT pg_total_relation_size('token_blocklist')"))
+        if dialect == "sqlite":
+            return await db.scalar(text(
+                "SELECT SUM(pgsize) FROM dbstat WHERE name = 'token_blocklist' "
+                "OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = 'token_blocklist')"
+            ))
+    except Exception:
+        # dbstat is an optional SQLite compile-time extension
+        await db.rollback()
+    return None
+
+
+async def purge_expired_tokens(
+    db,
+    *,
+    batch_size: int = BLOCKLIST_PURGE_BATCH_SIZE,
+    max_batches: Optional[int] = None,
+) -> BlocklistPurgeReport:
+    """Delete blocklist rows past `expires_at` in bounded batches.
+
+    Expired rows are dead weight: the JWT itself is rejected for expiry. Each
+    batch selects ids through idx_blocklist_expires_at and commits separately,
+    so locks are held only briefly.
+    """
+    started = time.perf_counter()
+    cutoff = datetime.now(timezone.utc)
+    rows_purged = 0
+    latencies: list[float] = []
+
+    while max_batches is None or len(latencies) < max_batches:
+        batch_started = time.perf_counter()
+        result = await db.execute(
+            select(TokenBlocklist.id)
+            .where(TokenBlocklist.expires_at < cutoff)
+            .order_by(TokenBlocklist.expires_at)
+            .limit(batch_size)
+        )
+        ids = result.scalars().all()
+        if not ids:
+            break
+        await db.execute(delete(TokenBlocklist).where(TokenBlocklist.id.in_(ids)))
+        await db.commit()
+        latencies.append((time.perf_counter() - batch_started) * 1000)
+        rows_purged += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    table_rows = await db.scalar(select(func.count()).select_from(TokenBlocklist))
+    return BlocklistPurgeReport(
+        rows_purged=rows_purged,
+        batches=len(latencies),
+        batch_latency_ms_avg=sum(latencies) / len(latencies) if latencies else 0.0,
+        batch_latency_ms_max=max(latencies, default=0.0),
+        duration_ms=(time.perf_counter() - started) * 1000,
+        table_rows=table_rows,
+        table_bytes=await blocklist_table_bytes(db),
+    )
+
+
+async def run_blocklist_purge_loop(
+    interval_seconds: float = BLOCKLIST_PURGE_INTERVAL_SECONDS,
+    batch_size: int = BLOCKLIST_PURGE_BATCH_SIZE,
+) -> None:
+    """Background task for the app lifespan: purge expired rows every interval."""
+    while True:
+        try:
+            async with session_scope() as db:
+                report = await purge_expired_tokens(db, batch_size=batch_size)
+            logger.info("Blocklist purge: %s", report.model_dump())
+        except Exception:
+            logger.exception("Blocklist purge failed")
+        await asyncio.sleep(interval_seconds)
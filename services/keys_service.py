@@ -0,0 +1,220 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from dotenv import load_dotenv
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, ed25519
+from jwt.algorithms import RSAAlgorithm, ECAlgorithm, OKPAlgorithm
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = os.getenv("ALGORITHM")
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR", "./keys")
+# Age after which a new signing key is generated; 0 disables scheduled rotation
+JWT_KEY_ROTATION_DAYS = float(os.getenv("JWT_KEY_ROTATION_DAYS", "30"))
+# Consumers may cache the JWKS this long, so a new key is published for this long before it signs
+JWKS_MAX_AGE_SECONDS = int(os.getenv("JWKS_MAX_AGE_SECONDS", "300"))
+JWT_KEYS_RELOAD_SECONDS = float(os.getenv("JWT_KEYS_RELOAD_SECONDS", "60"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+
+ASYMMETRIC_ALGORITHMS = {"RS256", "RS384", "RS512", "ES256", "ES384", "ES512", "EdDSA"}
+
+_JWK_CONVERTERS = {"RS": RSAAlgorithm, "ES": ECAlgorithm, "Ed": OKPAlgorithm}
+
+
+def is_asymmetric(algorithm: Optional[str]) -> bool:
+    return algorithm in ASYMMETRIC_ALGORITHMS
+
+
+def generate_private_key(algorithm: str):
+    if algorithm.startswith("RS"):
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    if algorithm.startswith("ES"):
+        curve = {"ES256": ec.SECP256R1(), "ES384": ec.SECP384R1(), "ES512": ec.SECP521R1()}[algorithm]
+        return ec.generate_private_key(curve)
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"Unsupported asymmetric algorithm: {algorithm}")
+
+
+class SigningKey:
+    def __init__(self, kid: str, private_key, created_at: float):
+        self.kid = kid
+        self.private_key = private_key
+        self.public_key = private_key.public_key()
+        self.created_at = created_at
+
+
+class KeyRing:
+    """Parsed signing keys for asymmetric JWTs, one PEM file per `kid`.
+
+    Keys are parsed once and kept as `cryptography` objects. The signing key
+    is the newest key that has been published in the JWKS for at least
+    JWKS_MAX_AGE_SECONDS; older keys stay available for verification until
+    every token they signed has expired.
+    """
+
+    def __init__(
+        self,
+        keys_dir: str = JWT_KEYS_DIR,
+        algorithm: Optional[str] = ALGORITHM,
+        *,
+        rotation_days: float = JWT_KEY_ROTATION_DAYS,
+        publish_seconds: int = JWKS_MAX_AGE_SECONDS,
+        reload_seconds: float = JWT_KEYS_RELOAD_SECONDS,
+    ):
+        self.keys_dir = keys_dir
+        self.algorithm = algorithm
+        self.rotation_days = rotation_days
+        self.publish_seconds = publish_seconds
+        self.reload_seconds = reload_seconds
+        self._keys: dict[str, SigningKey] = {}
+        self._fingerprint: Optional[tuple] = None
+        self._last_reload = 0.0
+        self._jwks: Optional[bytes] = None
+        self._jwks_etag: Optional[str] = None
+        self._signing: Optional[SigningKey] = None
+        self._signing_until = 0.0
+
+    # ==================== LOADING ====================
+    def _key_files(self) -> list[str]:
+        if not os.path.isdir(self.keys_dir):
+            return []
+        return sorted(name for name in os.listdir(self.keys_dir) if name.endswith(".pem"))
+
+    def load(self) -> None:
+        """(Re)parse key files if the directory content changed."""
+        self._last_reload = time.monotonic()
+        files = self._key_files()
+        fingerprint = tuple((name, os.stat(os.path.join(self.keys_dir, name)).st_mtime) for name in files)
+        if fingerprint == self._fingerprint:
+            return
+        keys = {}
+        for name, mtime in fingerprint:
+            kid = name[:-len(".pem")]
+            existing = self._keys.get(kid)
+            if existing is not None:
+                keys[kid] = existing
+                continue
+            with open(os.path.join(self.keys_dir, name), "rb") as f:
+                private_key = serialization.load_pem_private_key(f.read(), password=None)
+            keys[kid] = SigningKey(kid, private_key, mtime)
+        self._keys = keys
+        self._fingerprint = fingerprint
+        self._jwks = None
+        self._signing = None
+
+    def maybe_reload(self) -> None:
+        if time.monotonic() - self._last_reload >= self.reload_seconds:
+            self.load()
+
+    # ==================== ROTATION ====================
+    def rotate(self) -> SigningKey:
+        """Generate and persist a new key; it signs once its publish window has passed."""
+        os.makedirs(self.keys_dir, exist_ok=True)
+        kid = f"{datetime.now(timezone.utc):%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+        private_key = generate_private_key(self.algorithm)
+        pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        path = os.path.join(self.keys_dir, f"{kid}.pem")
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(pem)
+        logger.info("Generated JWT signing key %s", kid)
+        self.load()
+        return self._keys[kid]
+
+    def retire_expired_keys(self) -> list[str]:
+        """Delete keys that can no longer have signed an unexpired token."""
+        active = self.signing_key()
+        retention = (max(self.rotation_days, 0) + REFRESH_TOKEN_EXPIRE_DAYS + 1) * 86400
+        cutoff = time.time() - retention
+        retired = [k.kid for k in self._keys.values() if k.created_at < cutoff and k is not active]
+        for kid in retired:
+            os.remove(os.path.join(self.keys_dir, f"{kid}.pem"))
+        if retired:
+            self.load()
+        return retired
+
+    def rotate_if_due(self) -> Optional[SigningKey]:
+        self.load()
+        newest = max(self._keys.values(), key=lambda k: k.created_at, default=None)
+        due = newest is None or (
+            self.rotation_days > 0 and time.time() - newest.created_at >= self.rotation_days * 86400
+        )
+        new_key = self.rotate() if due else None
+        self.retire_expired_keys()
+        return new_key
+
+    # ==================== LOOKUP ====================
+    @property
+    def kids(self) -> list[str]:
+        return sorted(self._keys)
+
+    def signing_key(self) -> SigningKey:
+        if self._signing is not None and time.time() < self._signing_until:
+            return self._signing
+        self.maybe_reload()
+        if not self._keys:
+            # First start: nothing to pre-publish, sign with the new key right away
+            self.rotate()
+        now = time.time()
+        published_before = now - self.publish_seconds
+        by_age = sorted(self._keys.values(), key=lambda k: k.created_at, reverse=True)
+        signing = next((key for key in by_age if key.created_at <= published_before), by_age[-1])
+        # Re-evaluate when the next pending key matures, or at the next reload
+        pending = [key.created_at + self.publish_seconds for key in by_age if key.created_at > signing.created_at]
+        self._signing = signing
+        self._signing_until = min(pending + [now + self.reload_seconds])
+        return signing
+
+    def verification_key(self, kid: Optional[str]):
+        key = self._keys.get(kid)
+        if key is None:
+            # Possibly rotated by another worker since our last reload
+            self.maybe_reload()
+            key = self._keys.get(kid)
+        return key.public_key if key is not None else None
+
+    # ==================== JWKS ====================
+    def jwks(self) -> tuple[bytes, str]:
+        """Serialized JWKS document and its ETag, rebuilt only when keys change."""
+        if is_asymmetric(self.algorithm):
+            self.maybe_reload()
+        if self._jwks is None:
+            keys = []
+            if is_asymmetric(self.algorithm):
+                converter = _JWK_CONVERTERS[self.algorithm[:2]]
+                for key in sorted(self._keys.values(), key=lambda k: k.created_at, reverse=True):
+                    jwk = converter.to_jwk(key.public_key, as_dict=True)
+                    jwk.update({"kid": key.kid, "alg": self.algorithm, "use": "sig"})
+                    keys.append(jwk)
+            self._jwks = json.dumps({"keys": keys}, separators=(",", ":")).encode()
+            self._jwks_etag = '"' + hashlib.sha256(self._jwks).hexdigest()[:32] + '"'
+        return self._jwks, self._jwks_etag
+
+
+key_ring = KeyRing()
+
+
+async def run_key_rotation_loop(check_seconds: float = 3600) -> None:
+    """Background task for the app lifespan: rotate and retire keys when due."""
+    while True:
+        await asyncio.sleep(check_seconds)
+        try:
+            key_ring.rotate_if_due()
+        except Exception:
+            logger.exception("JWT key rotation failed")
@@ -0,0 +1,85 @@
+from typing import Optional
+
+import importlib
+import json
+import os
+import time
+from dotenv import load_dotenv
+from sqlalchemy import delete
+
+from database import session_scope
+from models.oauth_state_models import OAuthState
+from utils.cache_utils import TTLCache
+
+
+load_dotenv()
+
+# memory (per worker), database (shared by all workers) or "package.module:Class"
+OAUTH_STATE_BACKEND = os.getenv("OAUTH_STATE_BACKEND", "memory")
+OAUTH_STATE_MEMORY_MAX_KEYS = int(os.getenv("OAUTH_STATE_MEMORY_MAX_KEYS", "100000"))
+
+
+class OAuthStateStore:
+    """Interface for pending OAuth requests; `pop` consumes an entry, so each state is usable once."""
+
+    async def put(self, key: str, data: dict, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def pop(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+
+class MemoryOAuthStateStore(OAuthStateStore):
+    """Per-worker entries; the callback must reach the worker that served the login redirect."""
+
+    def __init__(self, max_keys: int = OAUTH_STATE_MEMORY_MAX_KEYS):
+        self._entries = TTLCache(maxsize=max_keys)
+
+    async def put(self, key: str, data: dict, ttl: float) -> None:
+        self._entries.set(key, data, expires_at=time.time() + ttl)
+
+    async def pop(self, key: str) -> Optional[dict]:
+        # TTLCache.pop ignores expiry, so read through get() first
+        if self._entries.get(key) is None:
+            return None
+        return self._entries.pop(key)
+
+
+class DatabaseOAuthStateStore(OAuthStateStore):
+    """Entries in the `oauth_states` table, consumed with a single DELETE ... RETURNING."""
+
+    def __init__(self, purge_seconds: float = 600):
+        self.purge_seconds = purge_seconds
+        self._last_purge = 0.0
+
+    async def put(self, key: str, data: dict, ttl: float) -> None:
+        now = time.time()
+        async with session_scope() as db:
+            db.add(OAuthState(key=key, data=json.dumps(data), expires_at=now + ttl))
+            if now - self._last_purge >= self.purge_seconds:
+                self._last_purge = now
+                await db.execute(delete(OAuthState).where(OAuthState.expires_at < now))
+            await db.commit()
+
+    async def pop(self, key: str) -> Optional[dict]:
+        async with session_scope() as db:
+            stmt = (
+                delete(OAuthState)
+                .where(OAuthState.key == key, OAuthState.expires_at >= time.time())
+                .returning(OAuthState.data)
+            )
+            data = (await db.execute(stmt)).scalar_one_or_none()
+            await db.commit()
+        return json.loads(data) if data is not None else None
+
+
+def load_store(name: str = OAUTH_STATE_BACKEND) -> OAuthStateStore:
+    if name == "memory":
+        return MemoryOAuthStateStore()
+    if name == "database":
+        return DatabaseOAuthStateStore()
+    module_name, _, attr = name.partition(":")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+oauth_state_store = load_store()
@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import asyncio
+import json
+import logging
+import os
+import random
+import socket
+import uuid
+from dotenv import load_dotenv
+from fastapi import Depends
+from sqlalchemy import select, update, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_db, session_scope
+from models.outbox_models import EmailOutbox, EmailKind, OutboxStatus
+from utils.email_utlis import get_smtp_pool, build_verification_message, SMTP_POOL_SIZE
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Run the dispatcher inside the API process; set to false when running `python cli.py outbox-worker`
+EMAIL_OUTBOX_IN_APP = os.getenv("EMAIL_OUTBOX_IN_APP", "true").lower() in ("1", "true", "yes")
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", str(SMTP_POOL_SIZE)))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "1"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "10"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class OutboxService:
+    def __init__(self, db: Depends(get_db)):
+        self.db = db
+
+    async def enqueue_verification_email(self, email: str, token: str) -> EmailOutbox:
+        message = EmailOutbox(
+            kind=EmailKind.VERIFICATION.value,
+            recipient=email,
+            payload=json.dumps({"token": token}),
+            next_attempt_at=datetime.now(timezone.utc),
+        )
+        self.db.add(message)
+        await self.db.commit()
+        return message
+
+
+def get_outbox_service(db: AsyncSession = Depends(get_db)) -> OutboxService:
+    return OutboxService(db)
+
+
+# ==================== DISPATCH ====================
+
+def _build_message(message: EmailOutbox):
+    payload = json.loads(message.payload)
+    if message.kind == EmailKind.VERIFICATION.value:
+        return build_verification_message(message.recipient, payload["token"])
+    raise ValueError(f"Unknown email kind: {message.kind}")
+
+
+def _backoff(attempts: int) -> timedelta:
+    delay = min(OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(1.0, 1.25))
+
+
+async def claim_batch(
+    db,
+    *,
+    batch_size: int = OUTBOX_BATCH_SIZE,
+    lease_seconds: float = OUTBOX_LEASE_SECONDS,
+) -> list[EmailOutbox]:
+    """Lease up to `batch_size` due messages to this worker.
+
+    Messages left in `sending` by a worker that died are reclaimed once their
+    lease expires, so delivery is at-least-once.
+    """
+    now = datetime.now(timezone.utc)
+    claimable = or_(
+        and_(EmailOutbox.status == OutboxStatus.PENDING.value, EmailOutbox.next_attempt_at <= now),
+        and_(EmailOutbox.status == OutboxStatus.SENDING.value, EmailOutbox.locked_until < now),
+    )
+    stmt = select(EmailOutbox.id).where(claimable).order_by(EmailOutbox.next_attempt_at).limit(batch_size)
+    if db.bind.dialect.name == "postgresql":
+        stmt = stmt.with_for_update(skip_locked=True)
+    ids = (await db.execute(stmt)).scalars().all()
+    if not ids:
+        await db.rollback()
+        return []
+
+    claim_token = f"{WORKER_ID}:{uuid.uuid4().hex}"
+    await db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(ids), claimable)
+        .values(
+            status=OutboxStatus.SENDING.value,
+            attempts=EmailOutbox.attempts + 1,
+            locked_until=now + timedelta(seconds=lease_seconds),
+            claimed_by=claim_token,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    result = await db.execute(select(EmailOutbox).where(EmailOutbox.claimed_by == claim_token))
+    return list(result.scalars().all())
+
+
+async def dispatch_pending_emails(
+    db,
+    *,
+    batch_size: int = OUTBOX_BATCH_SIZE,
+    concurrency: int = OUTBOX_CONCURRENCY,
+) -> int:
+    """Claim one batch, send it with bounded concurrency and record delivery state."""
+    messages = await claim_batch(db, batch_size=batch_size)
+    if not messages:
+        return 0
+
+    semaphore = asyncio.Semaphore(concurrency)
+    pool = get_smtp_pool()
+
+    async def deliver(message: EmailOutbox) -> Optional[str]:
+        async with semaphore:
+            try:
+                await pool.send_message(_build_message(message))
+                return None
+            except Exception as e:
+                return f"{type(e).__name__}: {e}"
+
+    errors = await asyncio.gather(*(deliver(message) for message in messages))
+
+    now = datetime.now(timezone.utc)
+    for message, error in zip(messages, errors):
+        message.locked_until = None
+        if error is None:
+            message.status = OutboxStatus.SENT.value
+            message.sent_at = now
+            message.last_error = None
+        elif message.attempts >= OUTBOX_MAX_ATTEMPTS:
+            message.status = OutboxStatus.FAILED.value
+            message.last_error = error
+        else:
+            message.status = OutboxStatus.PENDING.value
+            message.next_attempt_at = now + _backoff(message.attempts)
+            message.last_error = error
+    await db.commit()
+
+    failed = sum(error is not None for error in errors)
+    if failed:
+        logger.warning("Outbox batch: %d sent, %d failed", len(messages) - failed, failed)
+    return len(messages)
+
+
+async def run_outbox_worker(
+    *,
+    batch_size: int = OUTBOX_BATCH_SIZE,
+    concurrency: int = OUTBOX_CONCURRENCY,
+    poll_seconds: float = OUTBOX_POLL_SECONDS,
+) -> None:
+    """Dispatch loop used by the in-app worker and `python cli.py outbox-worker`."""
+    while True:
+        try:
+            async with session_scope() as db:
+                processed = await dispatch_pending_emails(db, batch_size=batch_size, concurrency=concurrency)
+        except Exception:
+            logger.exception("Outbox dispatch failed")
+            processed = 0
+        # Keep draining while batches come back full
+        if processed < batch_size:
+            await asyncio.sleep(poll_seconds)
@@ -0,0 +1,182 @@
+from collections import OrderedDict
+from typing import Optional
+
+import importlib
+import logging
+import math
+import os
+import time
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, status
+from sqlalchemy import case, delete
+
+from database import dialect_insert, session_scope
+from models.rate_limit_models import RateLimitCounter
+
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# memory (per worker), database (shared by all workers) or "package.module:Class"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_MEMORY_MAX_KEYS = int(os.getenv("RATE_LIMIT_MEMORY_MAX_KEYS", "100000"))
+RATE_LIMIT_LOGIN_IP = os.getenv("RATE_LIMIT_LOGIN_IP", "20/minute")
+RATE_LIMIT_LOGIN_EMAIL = os.getenv("RATE_LIMIT_LOGIN_EMAIL", "5/hour")
+RATE_LIMIT_REFRESH_IP = os.getenv("RATE_LIMIT_REFRESH_IP", "60/minute")
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class Rate:
+    """`limit` requests per `period` seconds, parsed from e.g. "20/minute"."""
+
+    def __init__(self, limit: int, period: int):
+        self.limit = limit
+        self.period = period
+
+    @classmethod
+    def parse(cls, value: str) -> "Rate":
+        limit, _, period = value.partition("/")
+        return cls(int(limit), _PERIODS[period.strip().rstrip("s")])
+
+    def __repr__(self) -> str:
+        return f"<Rate({self.limit}/{self.period}s)>"
+
+
+def retry_after(rate: Rate, count: int, prev_count: int, now: float) -> float:
+    """Seconds until the sliding-window estimate admits a request; 0 if it does now.
+
+    The estimate weighs the previous fixed window by how much of it still
+    overlaps the sliding window. Requests over the limit are counted too, so a
+    client that ignores Retry-After stays limited.
+    """
+    elapsed = (now % rate.period) / rate.period
+    if prev_count * (1 - elapsed) + count <= rate.limit:
+        return 0.0
+    # The retried request itself counts as one more hit
+    if count + 1 > rate.limit:
+        # Only the next window can admit it, once this window's weight there has decayed enough
+        return (1 - elapsed) * rate.period + (1 - (rate.limit - 1) / count) * rate.period
+    needed = 1 - (rate.limit - count - 1) / prev_count
+    return max((needed - elapsed) * rate.period, 0.0)
+
+
+class RateLimitBackend:
+    """Interface for counter storage; `hit` records a request and returns its retry delay."""
+
+    async def hit(self, key: str, rate: Rate) -> float:
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Per-worker counters, bounded by LRU eviction of idle keys."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MEMORY_MAX_KEYS):
+        self.max_keys = max_keys
+        self._counters: "OrderedDict[str, list[int]]" = OrderedDict()
+
+    async def hit(self, key: str, rate: Rate) -> float:
+        now = time.time()
+        window = int(now // rate.period)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = [window, 0, 0]
+            if len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+        else:
+            self._counters.move_to_end(key)
+        if counter[0] != window:
+            counter[2] = counter[1] if counter[0] == window - 1 else 0
+            counter[0], counter[1] = window, 0
+        counter[1] += 1
+        return retry_after(rate, counter[1], counter[2], now)
+
+
+class DatabaseRateLimitBackend(RateLimitBackend):
+    """Counters in the `rate_limit_counters` table, updated with one upsert per hit."""
+
+    def __init__(self, purge_seconds: float = 600):
+        self.purge_seconds = purge_seconds
+        self._last_purge = 0.0
+
+    async def hit(self, key: str, rate: Rate) -> float:
+        now = time.time()
+        window = int(now // rate.period)
+        async with session_scope() as db:
+            stmt = dialect_insert(db, RateLimitCounter).values(
+                key=key, window_start=window, count=1, prev_count=0, expires_at=(window + 2) * rate.period
+            )
+            # SET expressions see the row as it was before this statement
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[RateLimitCounter.key],
+                set_={
+                    "prev_count": case(
+                        (RateLimitCounter.window_start == window, RateLimitCounter.prev_count),
+                        (RateLimitCounter.window_start == window - 1, RateLimitCounter.count),
+                        else_=0,
+                    ),
+                    "count": case(
+                        (RateLimitCounter.window_start == window, RateLimitCounter.count + 1),
+                        else_=1,
+                    ),
+                    "window_start": window,
+                    "expires_at": stmt.excluded.expires_at,
+                },
+            ).returning(RateLimitCounter.count, RateLimitCounter.prev_count)
+            count, prev_count = (await db.execute(stmt)).one()
+            if now - self._last_purge >= self.purge_seconds:
+                self._last_purge = now
+                await db.execute(delete(RateLimitCounter).where(RateLimitCounter.expires_at < now))
+            await db.commit()
+        return retry_after(rate, count, prev_count, now)
+
+
+def load_backend(name: str = RATE_LIMIT_BACKEND) -> RateLimitBackend:
+    if name == "memory":
+        return MemoryRateLimitBackend()
+    if name == "database":
+        return DatabaseRateLimitBackend()
+    module_name, _, attr = name.partition(":")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+class RateLimiter:
+    def __init__(self, backend: RateLimitBackend, enabled: bool = RATE_LIMIT_ENABLED):
+        self.backend = backend
+        self.enabled = enabled
+
+    async def check(self, key: str, rate: Rate) -> None:
+        """Count a request against `key`; raise 429 with Retry-After when over `rate`."""
+        if not self.enabled:
+            return
+        delay = await self.backend.hit(key, rate)
+        if delay > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(delay))},
+            )
+
+
+rate_limiter = RateLimiter(load_backend())
+
+LOGIN_IP_RATE = Rate.parse(RATE_LIMIT_LOGIN_IP)
+LOGIN_EMAIL_RATE = Rate.parse(RATE_LIMIT_LOGIN_EMAIL)
+REFRESH_IP_RATE = Rate.parse(RATE_LIMIT_REFRESH_IP)
+
+
+def client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the real client
+    return request.client.host if request.client else "unknown"
+
+
+# ==================== DEPENDENCY HELPERS ====================
+async def limit_login(request: Request, email: str):
+    await rate_limiter.check(f"login:ip:{client_ip(request)}", LOGIN_IP_RATE)
+    await rate_limiter.check(f"login:email:{email.strip().lower()}", LOGIN_EMAIL_RATE)
+
+
+async def limit_refresh(request: Request):
+    await rate_limiter.check(f"refresh:ip:{client_ip(request)}", REFRESH_IP_RATE)
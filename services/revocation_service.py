@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import os
+import time
+from dotenv import load_dotenv
+from sqlalchemy import select
+
+from models.token_models import TokenBlocklist
+from utils.cache_utils import BloomFilter
+
+
+load_dotenv()
+
+
+REVOCATION_FILTER_ENABLED = os.getenv("REVOCATION_FILTER", "true").lower() in ("1", "true", "yes")
+REVOCATION_FILTER_BLOOM = os.getenv("REVOCATION_FILTER_BLOOM", "false").lower() in ("1", "true", "yes")
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "1000000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "2"))
+REVOCATION_RELOAD_SECONDS = float(os.getenv("REVOCATION_RELOAD_SECONDS", "3600"))
+
+# Rows are pulled from `watermark - overlap` so that revocations committed by
+# slower transactions of other workers (created_at set at statement time) are not missed.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+class RevocationFilter:
+    """In-memory view of revoked jtis kept in front of the token_blocklist table.
+
+    A negative answer from `might_contain` is authoritative (up to one sync
+    interval behind other workers); a positive one must be confirmed against
+    the table. Other workers' revocations are pulled incrementally by
+    `created_at` watermark, and the whole filter is rebuilt from unexpired
+    rows every REVOCATION_RELOAD_SECONDS to shed expired jtis.
+    """
+
+    def __init__(
+        self,
+        *,
+        use_bloom: bool = REVOCATION_FILTER_BLOOM,
+        bloom_capacity: int = REVOCATION_BLOOM_CAPACITY,
+        bloom_error_rate: float = REVOCATION_BLOOM_ERROR_RATE,
+        sync_seconds: float = REVOCATION_SYNC_SECONDS,
+        reload_seconds: float = REVOCATION_RELOAD_SECONDS,
+    ):
+        self.use_bloom = use_bloom
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        self.sync_seconds = sync_seconds
+        self.reload_seconds = reload_seconds
+        self.loaded = False
+        self.watermark: Optional[datetime] = None
+        self._members = self._new_members(0)
+        self._last_sync = 0.0
+        self._last_reload = 0.0
+
+    def _new_members(self, expected: int):
+        if self.use_bloom:
+            return BloomFilter(max(self.bloom_capacity, expected * 2), self.bloom_error_rate)
+        return set()
+
+    def _track(self, jti: str, created_at: Optional[datetime]) -> None:
+        self._members.add(jti)
+        if created_at is not None and (self.watermark is None or created_at > self.watermark):
+            self.watermark = created_at
+
+    def might_contain(self, jti: str) -> bool:
+        return jti in self._members
+
+    def add(self, jti: str) -> None:
+        """Record a revocation made by this worker."""
+        self._members.add(jti)
+
+    async def load(self, db) -> int:
+        """Rebuild the filter from every unexpired blocklist row."""
+        self._last_reload = self._last_sync = time.monotonic()
+        result = await db.execute(
+            select(TokenBlocklist.jti, TokenBlocklist.created_at)
+            .where(TokenBlocklist.expires_at > datetime.now(timezone.utc))
+        )
+        rows = result.all()
+        self._members = self._new_members(len(rows))
+        self.watermark = None
+        for jti, created_at in rows:
+            self._track(jti, created_at)
+        self.loaded = True
+        return len(rows)
+
+    async def sync(self, db) -> int:
+        """Pull rows revoked since the last watermark (e.g. by other workers)."""
+        self._last_sync = time.monotonic()
+        stmt = select(TokenBlocklist.jti, TokenBlocklist.created_at)
+        if self.watermark is not None:
+            stmt = stmt.where(TokenBlocklist.created_at >= self.watermark - SYNC_OVERLAP)
+        result = await db.execute(stmt)
+        rows = result.all()
+        for jti, created_at in rows:
+            self._track(jti, created_at)
+        return len(rows)
+
+    async def refresh(self, db) -> None:
+        """Load, reload or incrementally sync the filter when due."""
+        now = time.monotonic()
+        if not self.loaded or now - self._last_reload >= self.reload_seconds:
+            await self.load(db)
+        elif now - self._last_sync >= self.sync_seconds:
+            await self.sync(db)
+
+
+revocation_filter = RevocationFilter()
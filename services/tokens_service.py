@@ -3,18 +3,27 @@ from typing import Optional
 from uuid import UUID
 
 import os
+import time
 import uuid
-import jwt
+import hashlib
 from jwt.exceptions import InvalidTokenError
 from dotenv import load_dotenv
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
+from database import get_db, dialect_insert, replica_reads, primary_reads
 from models.token_models import TokenBlocklist, TokenType
+from models.users_models import UserRole
+from services.revocation_service import revocation_filter, REVOCATION_FILTER_ENABLED
+from services.keys_service import key_ring
+from utils.cache_utils import TTLCache
+from utils.jwt_utils import JWTCodec, InvalidTokenTypeError, new_jti
+from utils.metrics_utils import JWT_DURATION
+from utils.serialization_utils import Serializer
 
 
 load_dotenv()
@@ -25,6 +34,36 @@ ALGORITHM = os.getenv("ALGORITHM")
 EMAIL_TOKEN_EXPIRE_MINUTES = int(os.getenv("EMAIL_TOKEN_EXPIRE_MINUTES", "5"))
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+ACCESS_TOKEN_CACHE_SIZE = int(os.getenv("ACCESS_TOKEN_CACHE_SIZE", "10000"))
+# Embed user id, role and revocation version in access tokens so guards can authorize without a user lookup
+ACCESS_TOKEN_CLAIMS = os.getenv("ACCESS_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+# Verified access-token payloads, keyed by the SHA-256 digest of the token string.
+# Entries expire with the token's own `exp`; only successfully validated tokens are stored.
+access_token_cache = TTLCache(maxsize=ACCESS_TOKEN_CACHE_SIZE)
+
+# Keys and header segments are prepared once per process, not per token
+jwt_codec = JWTCodec(ALGORITHM, SECRET_KEY, key_ring)
+
+
+def family_key(family: str) -> str:
+    """Blocklist jti under which a whole refresh-token family is revoked."""
+    return f"family:{family}"
+
+
+def user_version_key(user_id, version: int) -> str:
+    """Blocklist jti under which the access tokens of one user version are revoked."""
+    return f"user:{user_id}:{version}"
+
+
+def access_token_data(user) -> dict:
+    """Access-token claims for `user` (an ORM row or a RETURNING row with the same columns)."""
+    data = {"sub": user.email}
+    if ACCESS_TOKEN_CLAIMS:
+        data.update({"uid": str(user.id), "role": UserRole(user.role).value, "rv": user.token_version})
+        if user.disabled:
+            data["dis"] = True
+    return data
 
 
 class TokenPair(BaseModel):
@@ -33,6 +72,9 @@ class TokenPair(BaseModel):
     token_type: str
 
 
+token_pair_serializer = Serializer(TokenPair)
+
+
 bearer_scheme = HTTPBearer(
     scheme_name="Bearer Token",
     description="Enter your access token here",
@@ -42,19 +84,52 @@ bearer_scheme = HTTPBearer(
 class TokenService:
     def __init__(self, db: Depends(get_db)):
         self.db = db
-        self.sercret = SECRET_KEY
-        self.algorithm = ALGORITHM
+        self.codec = jwt_codec
 
     # ==================== DB-RELATED METHODS ====================
-    def is_blacklisted(self, jti: str) -> bool:
-        return (
-            self.db.query(TokenBlocklist)
-            .filter(TokenBlocklist.jti == jti)
-            .first()
-            is not None
+    @replica_reads
+    async def get_blacklisted(self, jti: str) -> Optional[TokenBlocklist]:
+        result = await self.db.execute(select(TokenBlocklist).where(TokenBlocklist.jti == jti))
+        return result.scalars().first()
+
+    async def _may_be_revoked(self, jti: str) -> bool:
+        # Negative filter answers skip the DB; only filter hits are confirmed against the table
+        if not REVOCATION_FILTER_ENABLED:
+            return True
+        await revocation_filter.refresh(self.db)
+        return revocation_filter.might_contain(jti)
+
+    @replica_reads
+    async def is_blacklisted(self, jti: str) -> bool:
+        if not await self._may_be_revoked(jti):
+            return False
+        return await self.get_blacklisted(jti) is not None
+
+    async def _insert_revocation(
+        self,
+        *,
+        jti: str,
+        token_type: TokenType,
+        user_id: Optional[UUID],
+        expires_at: datetime,
+        reason: Optional[str],
+    ) -> bool:
+        """Conditional insert into the blocklist; False if the jti was already there."""
+        stmt = (
+            dialect_insert(self.db, TokenBlocklist)
+            .values(
+                jti=jti,
+                token_type=token_type.value if hasattr(token_type, "value") else str(token_type),
+                user_id=user_id,
+                expires_at=expires_at,
+                reason=reason,
+            )
+            .on_conflict_do_nothing(index_elements=[TokenBlocklist.jti])
+            .returning(TokenBlocklist.id)
         )
+        return (await self.db.execute(stmt)).scalar_one_or_none() is not None
 
-    def blacklist_token(
+    async def blacklist_token(
         self,
         *,
         jti: str,
@@ -62,33 +137,111 @@ class TokenService:
         user_id: Optional[UUID],
         expires_at: datetime,
         reason: Optional[str] = None,
-    ) -> TokenBlocklist:
-        if self.is_blacklisted(jti):
-            return (
-                self.db.query(TokenBlocklist)
-                .filter(TokenBlocklist.jti == jti)
-                .first()
-            )
-
-        entry = TokenBlocklist(
-            jti=jti,
-            token_type=token_type.value if hasattr(token_type, "value") else str(token_type),
+    ) -> bool:
+        """Revoke `jti`; returns False if it was already revoked."""
+        inserted = await self._insert_revocation(
+            jti=jti, token_type=token_type, user_id=user_id, expires_at=expires_at, reason=reason
+        )
+        await self.db.commit()
+        revocation_filter.add(jti)
+        return inserted
+
+    async def revoke_token_family(self, family: str, *, user_id: Optional[UUID], reason: str) -> None:
+        # Outlives every refresh token of the family: none is issued after this point
+        await self.blacklist_token(
+            jti=family_key(family),
+            token_type=TokenType.REFRESH,
             user_id=user_id,
-            expires_at=expires_at,
+            expires_at=datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
             reason=reason,
         )
-        self.db.add(entry)
-        self.db.commit()
-        self.db.refresh(entry)
-        return entry
+
+    async def add_user_revocations(self, versions: dict[UUID, int], *, reason: str) -> None:
+        """Revoke the access tokens issued to each user at the given version.
+
+        Runs in the caller's transaction, next to the statement that bumped
+        `token_version`. The jti names the user, so `user_id` is left empty
+        and the rows do not keep a deleted user from being removed.
+        """
+        if not versions:
+            return
+        expires_at = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        rows = [
+            {
+                "id": uuid.uuid4(),
+                "jti": user_version_key(user_id, version),
+                "token_type": TokenType.ACCESS.value,
+                "expires_at": expires_at,
+                "reason": reason,
+            }
+            for user_id, version in versions.items()
+        ]
+        table = TokenBlocklist.__table__
+        stmt = dialect_insert(self.db, table).on_conflict_do_nothing(index_elements=[table.c.jti])
+        await self.db.execute(stmt, rows)
+        for row in rows:
+            revocation_filter.add(row["jti"])
+
+    async def detach_user_revocations(self, user_ids: list[UUID]) -> None:
+        """Clear `user_id` on the blocklist rows of users about to be deleted, in the caller's transaction.
+
+        The revocations stay in force; only the reference that would block the delete goes.
+        """
+        await self.db.execute(
+            update(TokenBlocklist)
+            .where(TokenBlocklist.user_id.in_(user_ids))
+            .values(user_id=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    @primary_reads
+    async def rotate_refresh_token(self, payload: dict, *, user_id: Optional[UUID]) -> str:
+        """Consume a decoded refresh token and issue its successor in the same family.
+
+        The old jti is consumed by a single conditional insert. If it was
+        already there the token is being reused (replayed, or raced by a
+        concurrent refresh), so the whole family is revoked.
+        """
+        family = payload.get("fam") or payload["jti"]
+        if await self.is_blacklisted(family_key(family)):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+
+        consumed = await self._insert_revocation(
+            jti=payload["jti"],
+            token_type=TokenType.REFRESH,
+            user_id=user_id,
+            expires_at=datetime.fromtimestamp(payload["exp"], timezone.utc),
+            reason="rotated",
+        )
+        if not consumed:
+            await self.revoke_token_family(family, user_id=user_id, reason="reuse")
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token reuse detected")
+        await self.db.commit()
+        revocation_filter.add(payload["jti"])
+        return self.create_refresh_token(data={"sub": payload.get("sub")}, family=family)
 
     # ==================== JWT HELPERS ====================
+    def _encode(self, claims: dict) -> str:
+        start = time.perf_counter()
+        token = self.codec.encode(claims)
+        JWT_DURATION.labels("encode", claims["type"]).observe(time.perf_counter() - start)
+        return token
+
+    def _decode(self, token_str: str, token_type: str) -> dict:
+        """Signature, expiry and `type` check in one pass; raises InvalidTokenError."""
+        start = time.perf_counter()
+        try:
+            return self.codec.decode(token_str, token_type)
+        finally:
+            JWT_DURATION.labels("decode", token_type).observe(time.perf_counter() - start)
+
     @staticmethod
-    def _with_standard_claims(data: dict, *, token_type: str, exp_delta: timedelta) -> dict:
+    def _with_standard_claims(
+        data: dict, *, token_type: str, exp_delta: timedelta, now: Optional[float] = None, jti: Optional[str] = None
+    ) -> dict:
+        now = time.time() if now is None else now
         to_encode = data.copy()
-        expire = datetime.now(timezone.utc) + exp_delta
-        jti = uuid.uuid4().hex
-        to_encode.update({"exp": expire, "type": token_type, "jti": jti})
+        to_encode.update({"exp": int(now + exp_delta.total_seconds()), "type": token_type, "jti": jti or new_jti()})
         return to_encode
 
     # ==================== TOKEN CREATION ====================
@@ -96,62 +249,89 @@ class TokenService:
         if expires_delta is None:
             expires_delta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         to_encode = self._with_standard_claims(data, token_type="access", exp_delta=expires_delta)
-        return jwt.encode(to_encode, self.sercret, algorithm=self.algorithm)
+        return self._encode(to_encode)
 
-    def create_refresh_token(self, data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    def create_refresh_token(
+        self,
+        data: dict,
+        expires_delta: Optional[timedelta] = None,
+        family: Optional[str] = None,
+    ) -> str:
+        """`family` links rotated tokens; a new login starts a family named after its first jti."""
         if expires_delta is None:
             expires_delta = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
         to_encode = self._with_standard_claims(data, token_type="refresh", exp_delta=expires_delta)
-        return jwt.encode(to_encode, self.sercret, algorithm=self.algorithm)
+        to_encode["fam"] = family or to_encode["jti"]
+        return self._encode(to_encode)
 
     def create_email_verification_token(self, data: dict, expires_delta: Optional[timedelta] = None) -> str:
         if expires_delta is None:
             expires_delta = timedelta(minutes=EMAIL_TOKEN_EXPIRE_MINUTES)
         to_encode = self._with_standard_claims(data, token_type="email_verified", exp_delta=expires_delta)
-        return jwt.encode(to_encode, self.sercret, algorithm=self.algorithm)
+        return self._encode(to_encode)
+
+    def issue_pair(self, access_data: dict, refresh_data: dict, family: Optional[str] = None) -> tuple[str, str]:
+        """Access and refresh token of one login, sharing the clock read, jti randomness and key lookup."""
+        start = time.perf_counter()
+        now = time.time()
+        jtis = os.urandom(32).hex()
+        access = self._with_standard_claims(
+            access_data, token_type="access", exp_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+            now=now, jti=jtis[:32],
+        )
+        refresh = self._with_standard_claims(
+            refresh_data, token_type="refresh", exp_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+            now=now, jti=jtis[32:],
+        )
+        refresh["fam"] = family or refresh["jti"]
+        access_token, refresh_token = self.codec.encode_many([access, refresh])
+        JWT_DURATION.labels("encode", "pair").observe(time.perf_counter() - start)
+        return access_token, refresh_token
 
     # ==================== TOKEN VALIDATION ====================
     def validate_access_token(self, token_str: str) -> dict:
+        cache_key = hashlib.sha256(token_str.encode()).digest()
+        cached = access_token_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
         try:
-            payload = jwt.decode(token_str, self.sercret, algorithms=[self.algorithm])
-            if payload.get("type") != "access":
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail=f"Invalid token type: {payload.get('token_type')}",
-                )
-            return payload
+            payload = self._decode(token_str, "access")
+        except InvalidTokenTypeError as e:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Invalid token type: {e.token_type}")
         except InvalidTokenError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        access_token_cache.set(cache_key, payload, expires_at=payload["exp"])
+        return dict(payload)
 
     def validate_email_verified_token(self, token_str: str) -> dict:
         try:
-            payload = jwt.decode(token_str, self.sercret, algorithms=[self.algorithm])
-            if payload.get("type") != "email_verified":
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail=f"Invalid token type: {payload.get('token_type')}",
-                )
-            return payload
+            return self._decode(token_str, "email_verified")
+        except InvalidTokenTypeError as e:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Invalid token type: {e.token_type}")
         except InvalidTokenError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    def validate_refresh_token(self, refresh_token: str) -> dict:
+    def decode_refresh_token(self, refresh_token: str) -> dict:
+        """Signature/expiry/type check only; revocation is checked by the caller."""
         try:
-            payload = jwt.decode(refresh_token, self.sercret, algorithms=[self.algorithm])
-            if payload.get("type") != "refresh":
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail=f"Invalid token type: {payload.get('token_type')}",
-                )
-            jti = payload.get("jti")
-            if jti and self.is_blacklisted(jti):
-                raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
-            return payload
+            payload = self._decode(refresh_token, "refresh")
+        except InvalidTokenTypeError as e:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=f"Invalid token type: {e.token_type}")
         except InvalidTokenError:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+        if not payload.get("jti"):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+        return payload
+
+    async def validate_refresh_token(self, refresh_token: str) -> dict:
+        payload = self.decode_refresh_token(refresh_token)
+        family = payload.get("fam") or payload["jti"]
+        if await self.is_blacklisted(payload["jti"]) or await self.is_blacklisted(family_key(family)):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+        return payload
 
 
-def get_token_service(db: Session = Depends(get_db)) -> TokenService:
+def get_token_service(db: AsyncSession = Depends(get_db)) -> TokenService:
     return TokenService(db)
 
 
@@ -163,11 +343,11 @@ def get_access_payload(
     return token_service.validate_access_token(credentials.credentials)
 
 
-def get_refresh_payload(
+async def get_refresh_payload(
     refresh_token: str,
     token_service: TokenService = Depends(get_token_service),
 ):
-    return token_service.validate_refresh_token(refresh_token)
+    return await token_service.validate_refresh_token(refresh_token)
 
 
 def get_email_verification_payload(
@@ -1,18 +1,58 @@
-from schemas.users_schemas import UserUpdate
+from schemas.users_schemas import UserUpdate, UserImport, BulkItemStatus
 from fastapi import Depends
-from database import get_db
+from database import get_db, dialect_insert, replica_reads, primary_reads, read_from_replica, DATABASE_STICKY_SECONDS
 from models.users_models import User, UserRole, UserSocialAccount
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update, delete, bindparam, and_, or_, case, func, type_coerce, String
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.users_models import AuthProviderType
-from uuid import UUID
-from services.tokens_service import get_token_service, TokenService
-from datetime import timedelta
+from uuid import UUID, uuid4
+from pydantic import ValidationError
+from services.tokens_service import get_token_service, TokenService, access_token_data
+from services.activity_service import activity_buffer
+from utils.cache_utils import TTLCache
+from utils.bulk_utils import BulkRecord, chunked
+from datetime import datetime
+from typing import AsyncIterator, Optional
+import base64
+import json
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "50"))
+USERS_PAGE_MAX_SIZE = int(os.getenv("USERS_PAGE_MAX_SIZE", "500"))
+USERS_STREAM_BATCH_SIZE = int(os.getenv("USERS_STREAM_BATCH_SIZE", "1000"))
+# Items per statement and transaction in the bulk endpoints
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+USER_PROFILE_FIELDS = ("full_name", "given_name", "family_name", "picture")
+
+# ==================== USER IDENTITY CACHE ====================
+# Detached, fully loaded User rows shared across requests of this worker, stored
+# under ("email", email) and ("id", id). Writes go through invalidate_cached_user.
+
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+_user_cache_generation = 0
+_user_cache_invalidated_at = 0.0
+
+
+def invalidate_cached_user(user: User) -> None:
+    invalidate_cached_user_keys(user.email, user.id)
+
+
+def invalidate_cached_user_keys(email: str, user_id: UUID) -> None:
+    global _user_cache_generation, _user_cache_invalidated_at
+    _user_cache_generation += 1
+    _user_cache_invalidated_at = time.monotonic()
+    user_cache.pop(("email", email))
+    user_cache.pop(("id", user_id))
+
 
 class UserService:
     """Service class for user CRUD operations and business logic"""
@@ -23,109 +63,510 @@ class UserService:
 
     # ==================== USER METHODS ====================
 
-    def create_user(self, user: User):
+    @primary_reads
+    async def create_user(self, user: User):
+        """Insert `user`, or return the existing user with the same email."""
+        values = {
+            name: getattr(user, name)
+            for name in ("id", "email", *USER_PROFILE_FIELDS, "disabled", "role")
+            if getattr(user, name) is not None
+        }
+        values.setdefault("id", uuid4())
+        stmt = (
+            dialect_insert(self.db, User)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=[User.email])
+            .returning(User.id)
+        )
+        user_id = (await self.db.execute(stmt)).scalar_one_or_none()
+        await self.db.commit()
+        if user_id is None:
+            return await self.get_user_by_email(user.email, with_social_accounts=False)
+        user.id = user_id
+        return user
 
-        exists_user = self.get_user_by_email(user.email)
-        if exists_user:
-            return exists_user
+    @staticmethod
+    def _social_accounts_loader(many: bool):
+        # Lists: one extra `IN` query for the whole page. Single rows: one LEFT JOIN, no extra round trip
+        return selectinload(User.social_accounts) if many else joinedload(User.social_accounts)
 
-        self.db.add(user)
-        self.db.commit()
-        return user
+    async def _get_one_user(self, *criteria, with_social_accounts: bool):
+        stmt = select(User).where(*criteria)
+        if with_social_accounts:
+            stmt = stmt.options(self._social_accounts_loader(many=False))
+        result = await self.db.execute(stmt)
+        return result.unique().scalars().first()
 
-    def get_user(self, user_id: UUID):
-        return self.db.query(User).filter(User.id == user_id).first()
+    @replica_reads
+    async def get_user(self, user_id: UUID, *, with_social_accounts: bool = False):
+        return await self._get_one_user(User.id == user_id, with_social_accounts=with_social_accounts)
     
-    def get_user_by_email(self, email: str):
-        return self.db.query(User).filter(User.email == email).first()
+    @replica_reads
+    async def get_user_by_email(self, email: str, *, with_social_accounts: bool = True):
+        return await self._get_one_user(User.email == email, with_social_accounts=with_social_accounts)
+
+    @replica_reads
+    async def get_cached_user_by_email(self, email: str):
+        user = user_cache.get(("email", email))
+        if user is not None:
+            return user
+        generation = _user_cache_generation
+        return self._cache_user(await self.get_user_by_email(email), generation)
+
+    @replica_reads
+    async def get_cached_user(self, user_id: UUID):
+        user = user_cache.get(("id", user_id))
+        if user is not None:
+            return user
+        generation = _user_cache_generation
+        return self._cache_user(await self.get_user(user_id, with_social_accounts=True), generation)
+
+    async def preload_user_cache(self, limit: int) -> int:
+        """Cache the `limit` most recently updated active users (startup warmup)."""
+        generation = _user_cache_generation
+        stmt = (
+            select(User)
+            .where(User.disabled == False)
+            .order_by(User.updated_at.desc())
+            .limit(min(limit, USER_CACHE_SIZE))
+            .options(self._social_accounts_loader(many=True))
+        )
+        users = (await self.db.execute(stmt)).scalars().all()
+        for user in users:
+            self._cache_user(user, generation)
+        return len(users)
+
+    def _cache_user(self, user: User | None, generation: int):
+        if user is None:
+            return None
+        # Cached rows are shared between requests, so they must not stay bound to this session
+        self.db.expunge(user)
+        # Skip the store if a write invalidated entries while the row was being loaded,
+        # or if a lagging replica may have returned the row as it was before that write
+        recently_invalidated = time.monotonic() - _user_cache_invalidated_at < DATABASE_STICKY_SECONDS
+        if generation == _user_cache_generation and not (recently_invalidated and read_from_replica(self.db)):
+            user_cache.set(("email", user.email), user)
+            user_cache.set(("id", user.id), user)
+        return user
+
+    def _active_users_query(self, with_social_accounts: bool = True):
+        stmt = select(User).where(User.disabled == False).order_by(User.created_at, User.id)
+        if with_social_accounts:
+            stmt = stmt.options(self._social_accounts_loader(many=True))
+        return stmt
 
-    def get_all_users(self):
-        return self.db.query(User).filter(User.disabled == False).all()
+    def _after_cursor(self, cursor: str):
+        created_at, user_id = decode_users_cursor(cursor)
+        column = User.created_at
+        value = created_at
+        if self.db.bind.dialect.name == "sqlite":
+            # SQLite keeps server-default timestamps as 'YYYY-MM-DD HH:MM:SS' text; compare
+            # in that format, since a bound datetime is rendered with microseconds
+            column = type_coerce(User.created_at, String)
+            value = created_at.strftime("%Y-%m-%d %H:%M:%S.%f" if created_at.microsecond else "%Y-%m-%d %H:%M:%S")
+        return or_(column > value, and_(column == value, User.id > user_id))
+
+    @replica_reads
+    async def get_users_page(
+        self,
+        limit: int = USERS_PAGE_SIZE,
+        cursor: str | None = None,
+        *,
+        with_social_accounts: bool = True,
+    ):
+        """Keyset page of active users ordered by (created_at, id), plus the next cursor."""
+        stmt = self._active_users_query(with_social_accounts).limit(limit + 1)
+        if cursor:
+            stmt = stmt.where(self._after_cursor(cursor))
+        result = await self.db.execute(stmt)
+        users = result.scalars().all()
+        next_cursor = encode_users_cursor(users[limit - 1]) if len(users) > limit else None
+        return users[:limit], next_cursor
+
+    @replica_reads
+    async def stream_users(
+        self,
+        batch_size: int = USERS_STREAM_BATCH_SIZE,
+        *,
+        with_social_accounts: bool = True,
+    ) -> AsyncIterator[User]:
+        """Yield every active user, fetching `batch_size` rows at a time (server-side cursor)."""
+        result = await self.db.stream_scalars(
+            self._active_users_query(with_social_accounts).execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
+            for user in partition:
+                yield user
 
-    def update_user(self, user: User, user_update: UserUpdate):
+    async def update_user(self, user: User, user_update: UserUpdate):
+        user = await self.db.merge(user, load=False)
         user_update = user_update.model_dump(exclude_unset=True)
         for key, value in user_update.items():
             setattr(user, key, value)
 
-        self.db.commit()
-        self.db.refresh(user)
+        await self.db.commit()
+        invalidate_cached_user(user)
+        await self.db.refresh(user)
 
         return user
 
-    def delete_user(self, user: User):
-        self.db.delete(user)
-        self.db.commit()
+    async def delete_user(self, user: User):
+        await self._bump_token_versions([user.id], reason="deleted")
+        await self.token_service.detach_user_revocations([user.id])
+        user = await self.db.merge(user, load=False)
+        await self.db.delete(user)
+        await self.db.commit()
+        invalidate_cached_user(user)
         return user
 
-    def get_user_social_accounts(self, user: User):
+    async def get_user_social_accounts(self, user: User):
         return user.social_accounts
 
-    def get_user_social_account(self, provider_id: str):
-        return self.db.query(UserSocialAccount).filter(UserSocialAccount.provider_id == provider_id).first()
+    @replica_reads
+    async def get_user_social_account(self, provider_id: str):
+        result = await self.db.execute(
+            select(UserSocialAccount).where(UserSocialAccount.provider_id == provider_id)
+        )
+        return result.scalars().first()
 
-    def make_user_admin(self, user: User):
+    async def make_user_admin(self, user: User):
+        user = await self.db.merge(user, load=False)
         user.role = UserRole.ADMIN
-        self.db.commit()
-        self.db.refresh(user)
+        await self._bump_token_versions([user.id], reason="role")
+        await self.db.commit()
+        invalidate_cached_user(user)
+        await self.db.refresh(user)
         return user
 
-    def _create_user_social_account(self, user_social_account: UserSocialAccount):
-        self.db.add(user_social_account)
-        self.db.commit()
-        self.db.refresh(user_social_account)
-        return user_social_account
-
-    def process_google_login(self, user_info: dict):
-
-        user = self.get_user_by_email(user_info['email'])
-        if not user:
-            user = User(
-                email=user_info['email'],
-                full_name=user_info['name'],
-                given_name=user_info['given_name'],
-                family_name=user_info['family_name'],
-                picture=user_info['picture'],
-            )
-            self.create_user(user)
-        else:
-            user_update = UserUpdate(
-                full_name=user.full_name or user_info['name'] ,
-                given_name=user.given_name or user_info['given_name'] ,
-                family_name=user.family_name or user_info['family_name'] ,
-                picture=user.picture or user_info['picture'],
-            )
-            self.update_user(user, user_update)
-
-        user_social_account = self.get_user_social_account(user_info['sub'])
-        if not user_social_account:
-            user_social_account = UserSocialAccount(
-                user_id=user.id,
-                provider=AuthProviderType.GOOGLE,
-                provider_id=user_info['sub'],
-                email=user_info['email'],
-                is_verified=user_info['email_verified'],
-                name=user_info['name'],
-                given_name=user_info['given_name'],
-                family_name=user_info['family_name'],
-                picture=user_info['picture'],
+    async def _bump_token_versions(self, user_ids: list[UUID], *, reason: str) -> None:
+        """Move users to a new `token_version`, revoking access tokens that carry the previous one.
+
+        Part of the caller's transaction; call it with every change that claims
+        tokens would otherwise keep asserting (role, disabled, deletion).
+        """
+        stmt = (
+            update(User)
+            .where(User.id.in_(user_ids))
+            .values(token_version=User.token_version + 1)
+            .returning(User.id, User.token_version - 1)
+            .execution_options(synchronize_session=False)
+        )
+        versions = dict((await self.db.execute(stmt)).all())
+        await self.token_service.add_user_revocations(versions, reason=reason)
+
+    async def _upsert_google_user(self, user_info: dict):
+        """Insert the user or fill its empty profile fields from Google; returns the columns tokens are built from."""
+        stmt = dialect_insert(self.db, User).values(
+            email=user_info['email'],
+            full_name=user_info['name'],
+            given_name=user_info['given_name'],
+            family_name=user_info['family_name'],
+            picture=user_info['picture'],
+        )
+        profile = ("full_name", "given_name", "family_name", "picture")
+        # Existing values win; only NULL fields are filled in
+        filled = {name: func.coalesce(getattr(User, name), getattr(stmt.excluded, name)) for name in profile}
+        changed = or_(*(and_(getattr(User, name).is_(None), getattr(stmt.excluded, name).is_not(None)) for name in profile))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[User.email],
+            set_={**filled, "updated_at": case((changed, func.now()), else_=User.updated_at)},
+        ).returning(User.id, User.email, User.role, User.disabled, User.token_version)
+        return (await self.db.execute(stmt)).one()
+
+    async def _upsert_google_social_account(self, user_id: UUID, user_info: dict) -> None:
+        stmt = dialect_insert(self.db, UserSocialAccount).values(
+            user_id=user_id,
+            provider=AuthProviderType.GOOGLE,
+            provider_id=user_info['sub'],
+            email=user_info['email'],
+            is_verified=user_info['email_verified'],
+            name=user_info['name'],
+            given_name=user_info['given_name'],
+            family_name=user_info['family_name'],
+            picture=user_info['picture'],
+        )
+        # Existing accounts are left untouched; `last_used` goes through the activity buffer
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=[UserSocialAccount.provider, UserSocialAccount.provider_id],
+        )
+        await self.db.execute(stmt)
+
+    async def process_google_login(self, user_info: dict, ip_address: Optional[str] = None):
+        # One transaction: both upserts are idempotent, so concurrent callbacks for
+        # the same new user converge on one row instead of hitting a unique violation
+        try:
+            user = await self._upsert_google_user(user_info)
+            await self._upsert_google_social_account(user.id, user_info)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+
+        invalidate_cached_user_keys(user_info['email'], user.id)
+
+        # Bookkeeping is written behind, off the login path
+        activity_buffer.touch_account(AuthProviderType.GOOGLE.value, user_info['sub'])
+        activity_buffer.record_login(user_info['email'], AuthProviderType.GOOGLE.value, ip_address)
+
+        # Issue the app's own access/refresh pair
+        return self.token_service.issue_pair(access_token_data(user), {"sub": user_info['email']})
+
+    # ==================== BULK ADMINISTRATION ====================
+
+    async def bulk_import_users(
+        self,
+        records: AsyncIterator[BulkRecord],
+        *,
+        update_existing: bool = False,
+        chunk_size: int = BULK_CHUNK_SIZE,
+    ) -> list[dict]:
+        """Create users in chunked transactions; existing emails are reported, or updated
+        with the non-empty fields given when `update_existing` is set."""
+        results = []
+        async for chunk in chunked(records, chunk_size):
+            users: dict[str, tuple[int, UserImport]] = {}
+            for record in chunk:
+                if record.error is not None:
+                    results.append(_bulk_item(record.index, BulkItemStatus.INVALID, detail=record.error))
+                    continue
+                try:
+                    user = UserImport.model_validate(record.value)
+                except ValidationError as e:
+                    results.append(_bulk_item(record.index, BulkItemStatus.INVALID, detail=_validation_detail(e)))
+                    continue
+                if user.email in users:
+                    results.append(_bulk_item(record.index, BulkItemStatus.DUPLICATE, email=user.email))
+                    continue
+                users[user.email] = (record.index, user)
+            if users:
+                results.extend(await self._import_chunk(users, update_existing))
+        results.sort(key=lambda item: item["index"])
+        return results
+
+    async def _import_chunk(self, users: dict[str, tuple[int, UserImport]], update_existing: bool) -> list[dict]:
+        # One SELECT, one batched INSERT and, when updating, one executemany UPDATE per chunk
+        try:
+            existing = dict(
+                (await self.db.execute(select(User.email, User.id).where(User.email.in_(list(users))))).all()
             )
-            self._create_user_social_account(user_social_account)
-            
-        else:
-            user_social_account.update_last_used()
-            self.db.commit()
+            new_rows = [
+                {
+                    "id": uuid4(),
+                    "email": email,
+                    **{name: getattr(user, name) for name in USER_PROFILE_FIELDS},
+                    "disabled": bool(user.disabled),
+                    "role": (user.role or UserRole.USER).value,
+                }
+                for email, (_, user) in users.items()
+                if email not in existing
+            ]
+            created = set()
+            if new_rows:
+                # Core executemany: batched into multi-row VALUES by the dialect and compiled once
+                table = User.__table__
+                stmt = (
+                    dialect_insert(self.db, table)
+                    .on_conflict_do_nothing(index_elements=[table.c.email])
+                    .returning(table.c.id)
+                )
+                created = set((await self.db.execute(stmt, new_rows)).scalars())
+
+            updates = []
+            if update_existing:
+                for email, user_id in existing.items():
+                    user = users[email][1]
+                    if not user.model_dump(exclude={"email"}, exclude_none=True):
+                        continue
+                    updates.append({
+                        "b_id": user_id,
+                        **{f"b_{name}": getattr(user, name) for name in (*USER_PROFILE_FIELDS, "disabled")},
+                        "b_role": user.role.value if user.role else None,
+                    })
+            if updates:
+                table = User.__table__
+                names = (*USER_PROFILE_FIELDS, "disabled", "role")
+                stmt = (
+                    update(table)
+                    .where(table.c.id == bindparam("b_id"))
+                    # Fields left empty keep their current value
+                    .values({name: func.coalesce(bindparam(f"b_{name}"), table.c[name]) for name in names})
+                )
+                await self.db.execute(stmt, updates)
+                revoked = [row["b_id"] for row in updates if row["b_role"] is not None or row["b_disabled"] is not None]
+                if revoked:
+                    await self._bump_token_versions(revoked, reason="bulk import")
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            detail = _error_detail(e)
+            return [
+                _bulk_item(index, BulkItemStatus.FAILED, email=email, detail=detail)
+                for email, (index, _) in users.items()
+            ]
+
+        updated = {row["b_id"] for row in updates}
+        results = []
+        for row in new_rows:
+            index = users[row["email"]][0]
+            status = BulkItemStatus.CREATED if row["id"] in created else BulkItemStatus.EXISTS
+            results.append(_bulk_item(index, status, id=row["id"] if row["id"] in created else None, email=row["email"]))
+        for email, user_id in existing.items():
+            if user_id in updated:
+                invalidate_cached_user_keys(email, user_id)
+            status = BulkItemStatus.UPDATED if user_id in updated else BulkItemStatus.EXISTS
+            results.append(_bulk_item(users[email][0], status, id=user_id, email=email))
+        return results
+
+    async def bulk_set_disabled(
+        self,
+        records: AsyncIterator[BulkRecord],
+        disabled: bool,
+        *,
+        chunk_size: int = BULK_CHUNK_SIZE,
+    ) -> list[dict]:
+        return await self._bulk_by_id(
+            records,
+            lambda ids: (
+                update(User).where(User.id.in_(ids)).values(disabled=disabled, token_version=User.token_version + 1)
+            ),
+            BulkItemStatus.UPDATED,
+            chunk_size,
+        )
 
+    async def bulk_set_role(
+        self,
+        records: AsyncIterator[BulkRecord],
+        role: UserRole,
+        *,
+        chunk_size: int = BULK_CHUNK_SIZE,
+    ) -> list[dict]:
+        return await self._bulk_by_id(
+            records,
+            lambda ids: (
+                update(User).where(User.id.in_(ids)).values(role=role.value, token_version=User.token_version + 1)
+            ),
+            BulkItemStatus.UPDATED,
+            chunk_size,
+        )
 
-        # Create new app access token
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = self.token_service.create_access_token(
-            data={"sub": user_info['email']}, expires_delta=access_token_expires
+    async def bulk_delete_users(
+        self,
+        records: AsyncIterator[BulkRecord],
+        *,
+        chunk_size: int = BULK_CHUNK_SIZE,
+    ) -> list[dict]:
+        # Social accounts go with their user through ON DELETE CASCADE
+        return await self._bulk_by_id(
+            records,
+            lambda ids: delete(User).where(User.id.in_(ids)),
+            BulkItemStatus.DELETED,
+            chunk_size,
         )
-        refresh_token = self.token_service.create_refresh_token(data={"sub": user_info['email']})
-        return access_token, refresh_token
+
+    async def _bulk_by_id(
+        self,
+        records: AsyncIterator[BulkRecord],
+        statement_for,
+        status: BulkItemStatus,
+        chunk_size: int,
+    ) -> list[dict]:
+        """Run `statement_for(ids)` (an UPDATE bumping `token_version`, or a DELETE) once per chunk of user ids."""
+        results = []
+        async for chunk in chunked(records, chunk_size):
+            ids: dict[UUID, int] = {}
+            for record in chunk:
+                user_id, error = _parse_user_id(record)
+                if error is not None:
+                    results.append(_bulk_item(record.index, BulkItemStatus.INVALID, detail=error))
+                elif user_id in ids:
+                    results.append(_bulk_item(record.index, BulkItemStatus.DUPLICATE, id=user_id))
+                else:
+                    ids[user_id] = record.index
+            if not ids:
+                continue
+            stmt = statement_for(list(ids))
+            # RETURNING sees the bumped row, so the version its tokens carried is one lower
+            revoked_version = User.token_version if stmt.is_delete else User.token_version - 1
+            stmt = stmt.returning(User.id, User.email, revoked_version).execution_options(synchronize_session=False)
+            try:
+                if stmt.is_delete:
+                    await self.token_service.detach_user_revocations(list(ids))
+                rows = (await self.db.execute(stmt)).all()
+                await self.token_service.add_user_revocations(
+                    {user_id: version for user_id, _, version in rows}, reason=status.value
+                )
+                await self.db.commit()
+            except SQLAlchemyError as e:
+                await self.db.rollback()
+                detail = _error_detail(e)
+                results.extend(
+                    _bulk_item(index, BulkItemStatus.FAILED, id=user_id, detail=detail) for user_id, index in ids.items()
+                )
+                continue
+            affected = {user_id: email for user_id, email, _ in rows}
+            for user_id, index in ids.items():
+                email = affected.get(user_id)
+                if email is None:
+                    results.append(_bulk_item(index, BulkItemStatus.NOT_FOUND, id=user_id))
+                else:
+                    invalidate_cached_user_keys(email, user_id)
+                    results.append(_bulk_item(index, status, id=user_id, email=email))
+        results.sort(key=lambda item: item["index"])
+        return results
+
+# ==================== BULK HELPERS ====================
+
+def _bulk_item(
+    index: int,
+    status: BulkItemStatus,
+    *,
+    id: Optional[UUID] = None,
+    email: Optional[str] = None,
+    detail: Optional[str] = None,
+) -> dict:
+    return {"index": index, "status": status, "id": id, "email": email, "detail": detail}
+
+
+def _validation_detail(error: ValidationError) -> str:
+    first = error.errors()[0]
+    location = ".".join(str(part) for part in first["loc"])
+    return f"{location}: {first['msg']}" if location else first["msg"]
+
+
+def _error_detail(error: SQLAlchemyError) -> str:
+    # The driver error, without SQLAlchemy's statement and parameters dump
+    orig = getattr(error, "orig", None)
+    return f"{type(error).__name__}: {orig if orig is not None else error}"
+
+
+def _parse_user_id(record: BulkRecord) -> tuple[Optional[UUID], Optional[str]]:
+    """Accepts a bare id or an object with an `id` field (NDJSON/CSV rows)."""
+    if record.error is not None:
+        return None, record.error
+    value = record.value.get("id") if isinstance(record.value, dict) else record.value
+    try:
+        return UUID(str(value)), None
+    except ValueError:
+        return None, f"Invalid user id: {value!r}"
+
+# ==================== PAGINATION CURSORS ====================
+
+def encode_users_cursor(user: User) -> str:
+    raw = json.dumps([user.created_at.isoformat(), user.id.hex])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_users_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """Raises ValueError on a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, user_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(user_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
 
 # ==================== DEPENDENCY INJECTION ====================
 
-def get_user_service(db: Session = Depends(get_db)) -> UserService:
+def get_user_service(db: AsyncSession = Depends(get_db)) -> UserService:
     """Dependency injection for UserService"""
     return UserService(db)
\ No newline at end of file
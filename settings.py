@@ -0,0 +1,39 @@
+from functools import lru_cache
+from typing import Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """App wiring and startup options, read from the environment and `.env`.
+
+    Tuning knobs of individual services (cache sizes, batch sizes, limits) stay
+    as constants next to the code that uses them; these are the options
+    `create_app` acts on.
+    """
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # Google OIDC client, created on first use
+    google_client_id: Optional[str] = None
+    google_client_secret: Optional[str] = None
+    google_discovery_url: str = "https://accounts.google.com/.well-known/openid-configuration"
+
+    # Features
+    metrics_enabled: bool = True
+    revocation_filter: bool = True
+    email_outbox_in_app: bool = True
+    blocklist_purge_interval_seconds: float = 3600
+    activity_flush_interval_seconds: float = 5
+    jwt_key_rotation_days: float = 30
+
+    # Startup
+    create_tables: bool = True
+    warmup_db_connections: int = 1
+    warmup_user_cache: int = 0
+    warmup_oidc: bool = True
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    return Settings()
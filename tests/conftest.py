@@ -0,0 +1,48 @@
+import os
+import sys
+import tempfile
+
+# Settings are read at import time, so the environment is set before any app module is imported
+_data_dir = tempfile.mkdtemp(prefix="fastapi-oauth-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_data_dir}/app.db",
+    "DATABASE_PROFILE": "fast",
+    "SECRET_KEY": "test-secret-key",
+    "ALGORITHM": "HS256",
+    "JWT_KEYS_DIR": os.path.join(_data_dir, "keys"),
+    "EMAIL_OUTBOX_IN_APP": "false",
+    "RATE_LIMIT_ENABLED": "false",
+    "METRICS_ENABLED": "false",
+    "WARMUP_OIDC": "false",
+    "BLOCKLIST_PURGE_INTERVAL_SECONDS": "0",
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from main import create_app  # noqa: E402
+from settings import Settings  # noqa: E402
+
+
+@pytest.fixture
+def data_dir() -> str:
+    return _data_dir
+
+
+@pytest.fixture
+def settings() -> Settings:
+    return Settings()
+
+
+@pytest.fixture
+async def app(settings):
+    app = create_app(settings)
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+@pytest.fixture
+async def client(app):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+import uuid
+
+from sqlalchemy import func, insert, select
+
+from database import engine
+from models.users_models import User
+
+
+def _seed(count: int, created_at=None) -> None:
+    rows = [{"id": uuid.uuid4(), "email": f"page-{uuid.uuid4().hex}@example.com"} for _ in range(count)]
+    if created_at is not None:
+        for row in rows:
+            row["created_at"] = created_at
+    with engine.begin() as conn:
+        conn.execute(insert(User), rows)
+
+
+async def _walk(client, limit: int) -> list[str]:
+    ids, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/users/", params=params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        ids.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+async def test_keyset_walk_across_whole_second_timestamps(client):
+    # Python-inserted rows are stored as '... HH:MM:SS.000000', server defaults as '... HH:MM:SS';
+    # pages must not repeat or skip rows whose timestamp falls on an exact second
+    _seed(40, datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc))
+    _seed(40, datetime(2024, 1, 1, 12, 0, 1, 250000, tzinfo=timezone.utc))
+    _seed(40)
+    with engine.connect() as conn:
+        expected = conn.execute(select(func.count()).select_from(User).where(User.disabled == False)).scalar_one()
+
+    ids = await _walk(client, limit=7)
+
+    assert len(ids) == len(set(ids)) == expected
+
+
+async def test_invalid_cursor_is_rejected(client):
+    response = await client.get("/users/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
@@ -1,20 +1,40 @@
 from starlette.requests import Request
-from authlib.integrations.starlette_client import OAuth
-import os
-
-oauth = OAuth()
-oauth.register(
-    name='google',
-    client_id=os.getenv('GOOGLE_CLIENT_ID'),
-    client_secret=os.getenv('GOOGLE_CLIENT_SECRET'),
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={
-        'scope': 'openid email profile'
-    },
-)
+from typing import Optional
+
+from settings import get_settings
+from services.oauth_state_service import oauth_state_store
+from utils.oidc_utils import OIDCClient
+
+
+_google_oidc: Optional[OIDCClient] = None
+
+
+def get_google_oidc() -> OIDCClient:
+    global _google_oidc
+    if _google_oidc is None:
+        settings = get_settings()
+        discovery_url = settings.google_discovery_url
+        _google_oidc = OIDCClient(
+            "google",
+            client_id=settings.google_client_id,
+            client_secret=settings.google_client_secret,
+            discovery_url=discovery_url,
+            scope='openid email profile',
+            state_store=oauth_state_store,
+            # Google id_tokens may carry either issuer form
+            issuers=["https://accounts.google.com", "accounts.google.com"]
+            if discovery_url.startswith("https://accounts.google.com") else None,
+        )
+    return _google_oidc
+
+
+async def close_google_oidc():
+    if _google_oidc is not None:
+        await _google_oidc.aclose()
+
 
 async def oauth_google_authorize_redirect(request: Request, redirect_uri: str):
-    return await oauth.google.authorize_redirect(request, redirect_uri)
+    return await get_google_oidc().authorize_redirect(request, redirect_uri)
 
 async def oauth_google_authorize_access_token(request: Request):
-    return await oauth.google.authorize_access_token(request)
+    return await get_google_oidc().authorize_access_token(request)
@@ -0,0 +1,104 @@
+from typing import Any, AsyncIterator, Optional
+
+import codecs
+import csv
+import json
+from starlette.requests import Request
+
+
+JSON_TYPES = {"application/json"}
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/jsonlines"}
+CSV_TYPES = {"text/csv", "application/csv"}
+
+
+class BulkRecord:
+    """One input item: the parsed value, or the reason it could not be parsed."""
+
+    __slots__ = ("index", "value", "error")
+
+    def __init__(self, index: int, value: Any = None, error: Optional[str] = None):
+        self.index = index
+        self.value = value
+        self.error = error
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _json_records(items: list) -> AsyncIterator[BulkRecord]:
+    for index, value in enumerate(items):
+        yield BulkRecord(index, value)
+
+
+async def _ndjson_records(request: Request) -> AsyncIterator[BulkRecord]:
+    index = 0
+    async for line in _lines(request.stream()):
+        if not line.strip():
+            continue
+        try:
+            yield BulkRecord(index, json.loads(line))
+        except ValueError:
+            yield BulkRecord(index, error="Invalid JSON line")
+        index += 1
+
+
+async def _csv_records(request: Request) -> AsyncIterator[BulkRecord]:
+    header = None
+    index = 0
+    async for line in _lines(request.stream()):
+        if not line.strip():
+            continue
+        row = next(csv.reader([line.rstrip("\r")]))
+        if header is None:
+            header = [name.strip() for name in row]
+            continue
+        if len(row) != len(header):
+            yield BulkRecord(index, error=f"Expected {len(header)} columns, got {len(row)}")
+        else:
+            yield BulkRecord(index, {name: value for name, value in zip(header, row) if value != ""})
+        index += 1
+
+
+async def read_bulk_records(request: Request) -> AsyncIterator[BulkRecord]:
+    """Items of a bulk request body: a JSON array, or NDJSON / CSV read as it streams in.
+
+    CSV needs a header row; empty cells are read as missing values and quoted
+    fields cannot span lines. Raises ValueError up front for an unsupported
+    content type or a JSON body that is not an array; per-item problems are
+    reported on the item instead.
+    """
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    if content_type in JSON_TYPES:
+        try:
+            body = json.loads(await request.body())
+        except ValueError:
+            raise ValueError("Body is not valid JSON")
+        if not isinstance(body, list):
+            raise ValueError("Expected a JSON array")
+        return _json_records(body)
+    if content_type in NDJSON_TYPES:
+        return _ndjson_records(request)
+    if content_type in CSV_TYPES:
+        return _csv_records(request)
+    raise ValueError(f"Unsupported content type: {content_type}")
+
+
+async def chunked(records: AsyncIterator[BulkRecord], size: int) -> AsyncIterator[list[BulkRecord]]:
+    chunk = []
+    async for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
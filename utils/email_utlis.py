@@ -1,12 +1,17 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, EmailStr
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from functools import lru_cache
+import aiosmtplib
+import asyncio
 import ssl
 import os
+import time
 import certifi
 
+from utils.metrics_utils import EMAIL_SEND_DURATION, EMAIL_SEND_FAILURES
+
 
 email_router = APIRouter(prefix="/auth/email")
 
@@ -16,52 +21,183 @@ SMTP_PORT = os.getenv("SMTP_PORT")
 SMTP_USER = os.getenv("SMTP_USER")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 SMTP_REPLY_TO = os.getenv("SMTP_REPLY_TO")
-EMAIL_TOKEN_EXPIRE_MINUTES = int(os.getenv("EMAIL_TOKEN_EXPIRE_MINUTES"))
+# Persistent authenticated connections kept open (also the max concurrent sends)
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# Disable only for local SMTP sinks that do not offer STARTTLS
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
 URL = os.getenv("URL")
 
-def send_verification_email(email: str, token: str):
+# Errors after which the connection is dropped and the send retried once on a fresh one
+RECONNECT_ERRORS = (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, aiosmtplib.SMTPTimeoutError, OSError)
+
+
+@lru_cache(maxsize=1)
+def get_ssl_context() -> ssl.SSLContext:
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+@lru_cache(maxsize=1)
+def load_magic_link_template() -> str | None:
+    """Read the magic-link HTML template once; None if missing/unreadable."""
     try:
-        # Create the email content (plain + HTML alternative)
-        message = MIMEMultipart("alternative")
-        message["From"] = SMTP_USER
-        message["To"] = email
-        message["Subject"] = f"Welcome! Click the button to login"
-        message["Reply-To"] = SMTP_REPLY_TO
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        template_path = os.path.join(base_dir, "static", "template", "magic-link.html")
+        with open(template_path, "r", encoding="utf-8") as f:
+            return f.read()
+    except Exception:
+        return None
+
+
+class SMTPConnectionPool:
+    """Pool of persistent, authenticated aiosmtplib connections.
 
-        verification_link = f"{URL}/auth/verify-token/?token={token}"
+    Connections are opened lazily (connect + STARTTLS + login once) and reused
+    across sends. A connection that fails mid-send is discarded and the message
+    retried once on a new connection.
+    """
 
-        # Plain text fallback
-        plain_text_body = verification_link
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: str | None,
+        password: str | None,
+        *,
+        size: int = SMTP_POOL_SIZE,
+        start_tls: bool = SMTP_STARTTLS,
+        timeout: float = SMTP_TIMEOUT,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.start_tls = start_tls
+        self.timeout = timeout
+        self._idle: list[aiosmtplib.SMTP] = []
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
 
-        # HTML body from template with link substitution
+    def _bind_loop(self) -> asyncio.Semaphore:
+        # Connections and the semaphore belong to the event loop that created them
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._idle = []
+            self._semaphore = asyncio.Semaphore(self.size)
+        return self._semaphore
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username or None,
+            password=self.password or None,
+            start_tls=self.start_tls,
+            tls_context=get_ssl_context() if self.start_tls else None,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        return smtp
+
+    @staticmethod
+    async def _discard(smtp: aiosmtplib.SMTP | None) -> None:
+        if smtp is None:
+            return
         try:
-            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            template_path = os.path.join(base_dir, "static", "template", "magic-link.html")
-            with open(template_path, "r", encoding="utf-8") as f:
-                html_template = f.read()
-            html_body = html_template.replace("{{ link }}", verification_link)
+            smtp.close()
         except Exception:
-            # Fallback minimal HTML if template missing/unreadable
-            html_body = (
-                f"<html><body>"
-                f"<p>Click the button or link to continue:</p>"
-                f"<p><a href=\"{verification_link}\" target=\"_blank\" rel=\"noopener noreferrer\">Enter</a></p>"
-                f"<p>{verification_link}</p>"
-                f"</body></html>"
-            )
-
-        message.attach(MIMEText(plain_text_body, "plain"))
-        message.attach(MIMEText(html_body, "html"))
-
-        # Connect to SMTP server
-        context = ssl.create_default_context(cafile=certifi.where())
-        server = smtplib.SMTP(SMTP_SERVER, int(SMTP_PORT) if SMTP_PORT else 587)
-        server.starttls(context=context)
-        server.login(SMTP_USER, SMTP_PASSWORD)
-
-        # Send email
-        server.sendmail(SMTP_USER, email, message.as_string())
-        server.quit()
+            pass
+
+    async def send_message(self, message) -> None:
+        start = time.perf_counter()
+        try:
+            await self._send_message(message)
+        except Exception as e:
+            EMAIL_SEND_DURATION.labels("error").observe(time.perf_counter() - start)
+            EMAIL_SEND_FAILURES.labels(type(e).__name__).inc()
+            raise
+        EMAIL_SEND_DURATION.labels("ok").observe(time.perf_counter() - start)
+
+    async def _send_message(self, message) -> None:
+        async with self._bind_loop():
+            smtp = self._idle.pop() if self._idle else None
+            for attempt in range(2):
+                try:
+                    if smtp is None or not smtp.is_connected:
+                        await self._discard(smtp)
+                        smtp = await self._connect()
+                    await smtp.send_message(message)
+                    self._idle.append(smtp)
+                    return
+                except RECONNECT_ERRORS:
+                    await self._discard(smtp)
+                    smtp = None
+                    if attempt:
+                        raise
+                except Exception:
+                    await self._discard(smtp)
+                    raise
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for smtp in idle:
+            try:
+                await smtp.quit()
+            except Exception:
+                await self._discard(smtp)
+
 
+_smtp_pool: SMTPConnectionPool | None = None
+
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    global _smtp_pool
+    if _smtp_pool is None:
+        _smtp_pool = SMTPConnectionPool(SMTP_SERVER, int(SMTP_PORT) if SMTP_PORT else 587, SMTP_USER, SMTP_PASSWORD)
+    return _smtp_pool
+
+
+def build_verification_message(email: str, token: str) -> MIMEMultipart:
+    # Create the email content (plain + HTML alternative)
+    message = MIMEMultipart("alternative")
+    message["From"] = SMTP_USER
+    message["To"] = email
+    message["Subject"] = f"Welcome! Click the button to login"
+    message["Reply-To"] = SMTP_REPLY_TO
+
+    verification_link = f"{URL}/auth/verify-token/?token={token}"
+
+    # Plain text fallback
+    plain_text_body = verification_link
+
+    # HTML body from template with link substitution
+    html_template = load_magic_link_template()
+    if html_template is not None:
+        html_body = html_template.replace("{{ link }}", verification_link)
+    else:
+        # Fallback minimal HTML if template missing/unreadable
+        html_body = (
+            f"<html><body>"
+            f"<p>Click the button or link to continue:</p>"
+            f"<p><a href=\"{verification_link}\" target=\"_blank\" rel=\"noopener noreferrer\">Enter</a></p>"
+            f"<p>{verification_link}</p>"
+            f"</body></html>"
+        )
+
+    message.attach(MIMEText(plain_text_body, "plain"))
+    message.attach(MIMEText(html_body, "html"))
+    return message
+
+
+async def send_verification_email(email: str, token: str):
+    try:
+        await get_smtp_pool().send_message(build_verification_message(email, token))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Email failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Email failed: {str(e)}")
+
+
+async def close_smtp_pool():
+    if _smtp_pool is not None:
+        await _smtp_pool.close()
@@ -0,0 +1,180 @@
+from typing import Optional
+
+import base64
+import binascii
+import hmac
+import json
+import os
+import time
+import orjson
+from jwt.algorithms import get_default_algorithms, HMACAlgorithm
+from jwt.exceptions import (
+    DecodeError,
+    ExpiredSignatureError,
+    ImmatureSignatureError,
+    InvalidAlgorithmError,
+    InvalidSignatureError,
+    InvalidTokenError,
+)
+
+
+class InvalidTokenTypeError(InvalidTokenError):
+    """Valid signature and expiry, but a different `type` claim than expected."""
+
+    def __init__(self, token_type):
+        super().__init__(f"Invalid token type: {token_type}")
+        self.token_type = token_type
+
+
+def b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def b64decode(segment: bytes) -> bytes:
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+
+def new_jti() -> str:
+    """32 random hex characters, the same shape as `uuid4().hex` without building a UUID."""
+    return os.urandom(16).hex()
+
+
+class JWTCodec:
+    """JWS compact encoding/decoding for the app's own tokens.
+
+    Same wire format as `jwt.encode`/`jwt.decode` (tokens are interchangeable
+    with PyJWT), minus the per-call work that never changes: keys are prepared
+    once (an HMAC object is keyed once and copied per token, asymmetric keys
+    come parsed from the key ring), and the encoded header segment is built
+    once per `kid`. Decoding checks the signature, `exp`/`nbf` and the
+    expected `type` in one call.
+    """
+
+    def __init__(self, algorithm: Optional[str], secret: Optional[str] = None, key_ring=None):
+        self.algorithm = algorithm
+        self.secret = secret
+        self.key_ring = key_ring
+        self._alg = None
+        self._hmac = None
+        self._headers: dict[Optional[str], bytes] = {}
+        # Header segments seen on incoming tokens -> kid; a token's header is one of a few values
+        self._verified_headers: dict[bytes, Optional[str]] = {}
+
+    # ==================== KEYS ====================
+    def _prepare(self) -> None:
+        """Resolve the algorithm and key the HMAC once, on first use (settings may be absent at import)."""
+        algorithms = get_default_algorithms()
+        if self.algorithm not in algorithms or self.algorithm == "none":
+            raise InvalidAlgorithmError(f"Unsupported algorithm: {self.algorithm}")
+        alg = algorithms[self.algorithm]
+        if isinstance(alg, HMACAlgorithm):
+            if not self.secret:
+                raise ValueError(f"{self.algorithm} needs a secret key")
+            self._hmac = hmac.new(alg.prepare_key(self.secret), digestmod=alg.hash_alg)
+        elif self.key_ring is None:
+            raise ValueError(f"{self.algorithm} needs a key ring")
+        self._alg = alg
+
+    def _header_segment(self, kid: Optional[str]) -> bytes:
+        segment = self._headers.get(kid)
+        if segment is None:
+            header = {"alg": self.algorithm, "typ": "JWT"}
+            if kid is not None:
+                header["kid"] = kid
+            # Byte-identical to PyJWT's header (sorted keys, compact separators)
+            segment = b64encode(json.dumps(header, separators=(",", ":"), sort_keys=True).encode())
+            self._headers[kid] = segment
+        return segment
+
+    def _signing(self) -> tuple[bytes, object]:
+        """(header segment, signing key) of the current signing key."""
+        if self._alg is None:
+            self._prepare()
+        if self._hmac is not None:
+            return self._header_segment(None), None
+        key = self.key_ring.signing_key()
+        return self._header_segment(key.kid), key.private_key
+
+    def _sign(self, signing_input: bytes, key) -> bytes:
+        if self._hmac is not None:
+            mac = self._hmac.copy()
+            mac.update(signing_input)
+            return mac.digest()
+        return self._alg.sign(signing_input, key)
+
+    def _verify(self, signing_input: bytes, kid: Optional[str], signature: bytes) -> bool:
+        if self._hmac is not None:
+            return hmac.compare_digest(signature, self._sign(signing_input, None))
+        key = self.key_ring.verification_key(kid)
+        if key is None:
+            raise InvalidTokenError("Unknown signing key")
+        return self._alg.verify(signing_input, key, signature)
+
+    # ==================== ENCODING ====================
+    def _encode_with(self, header: bytes, key, claims: dict) -> str:
+        signing_input = header + b"." + b64encode(orjson.dumps(claims))
+        return (signing_input + b"." + b64encode(self._sign(signing_input, key))).decode()
+
+    def encode(self, claims: dict) -> str:
+        """`claims` must be JSON-ready: `exp` as a unix timestamp, not a datetime."""
+        header, key = self._signing()
+        return self._encode_with(header, key, claims)
+
+    def encode_many(self, claims: list[dict]) -> list[str]:
+        """Encode several tokens with one signing-key lookup."""
+        header, key = self._signing()
+        return [self._encode_with(header, key, c) for c in claims]
+
+    # ==================== DECODING ====================
+    def _header_kid(self, segment: bytes) -> Optional[str]:
+        if self._alg is None:
+            self._prepare()
+        if segment in self._verified_headers:
+            return self._verified_headers[segment]
+        try:
+            header = orjson.loads(b64decode(segment))
+        except (binascii.Error, orjson.JSONDecodeError) as e:
+            raise DecodeError("Invalid header") from e
+        if not isinstance(header, dict):
+            raise DecodeError("Invalid header")
+        if header.get("alg") != self.algorithm:
+            raise InvalidAlgorithmError("The specified alg value is not allowed")
+        kid = header.get("kid")
+        if len(self._verified_headers) < 1024:
+            self._verified_headers[segment] = kid
+        return kid
+
+    def decode(self, token: str, token_type: Optional[str] = None, *, leeway: float = 0) -> dict:
+        """Verified claims; raises an `InvalidTokenError` subclass on any failure."""
+        try:
+            raw = token.encode("ascii")
+            signing_input, signature_segment = raw.rsplit(b".", 1)
+            header_segment, payload_segment = signing_input.split(b".")
+        except (UnicodeEncodeError, ValueError) as e:
+            raise DecodeError("Not enough segments") from e
+        kid = self._header_kid(header_segment)
+        try:
+            signature = b64decode(signature_segment)
+        except binascii.Error as e:
+            raise DecodeError("Invalid crypto padding") from e
+        if not self._verify(signing_input, kid, signature):
+            raise InvalidSignatureError("Signature verification failed")
+        try:
+            payload = orjson.loads(b64decode(payload_segment))
+        except (binascii.Error, orjson.JSONDecodeError) as e:
+            raise DecodeError("Invalid payload") from e
+        if not isinstance(payload, dict):
+            raise DecodeError("Invalid payload")
+
+        now = time.time()
+        exp = payload.get("exp")
+        if not isinstance(exp, (int, float)) or isinstance(exp, bool):
+            raise DecodeError("Expiration Time claim (exp) must be a number")
+        if exp <= now - leeway:
+            raise ExpiredSignatureError("Signature has expired")
+        nbf = payload.get("nbf")
+        if isinstance(nbf, (int, float)) and nbf > now + leeway:
+            raise ImmatureSignatureError("The token is not yet valid (nbf)")
+        if token_type is not None and payload.get("type") != token_type:
+            raise InvalidTokenTypeError(payload.get("type"))
+        return payload
@@ -0,0 +1,221 @@
+from typing import Optional
+from urllib.parse import urlencode, urlparse
+
+import os
+import re
+import secrets
+import time
+import httpx
+import jwt
+from authlib.integrations.base_client import OAuthError
+from starlette.requests import Request
+from starlette.responses import RedirectResponse
+
+
+OIDC_HTTP_TIMEOUT = float(os.getenv("OIDC_HTTP_TIMEOUT", "10"))
+OIDC_HTTP_MAX_CONNECTIONS = int(os.getenv("OIDC_HTTP_MAX_CONNECTIONS", "20"))
+# Used when the provider response carries no Cache-Control max-age
+OIDC_CACHE_TTL_SECONDS = float(os.getenv("OIDC_CACHE_TTL_SECONDS", "3600"))
+# Minimum delay between JWKS refetches triggered by an unknown `kid`
+OIDC_JWKS_MIN_REFRESH_SECONDS = float(os.getenv("OIDC_JWKS_MIN_REFRESH_SECONDS", "60"))
+OIDC_STATE_TTL_SECONDS = int(os.getenv("OIDC_STATE_TTL_SECONDS", "600"))
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+def cache_ttl(response: httpx.Response, default: float = OIDC_CACHE_TTL_SECONDS) -> float:
+    """TTL from the response Cache-Control header (0 for no-store/no-cache)."""
+    cache_control = response.headers.get("cache-control", "").lower()
+    if "no-store" in cache_control or "no-cache" in cache_control:
+        return 0.0
+    match = _MAX_AGE.search(cache_control)
+    return float(match.group(1)) if match else default
+
+
+class OIDCClient:
+    """Authorization-code OIDC client with cached discovery/JWKS and a pooled HTTP client.
+
+    Discovery metadata and signing keys are fetched once and kept until their
+    Cache-Control max-age runs out; id_tokens are verified locally against the
+    parsed keys. All provider calls share one keep-alive `httpx.AsyncClient`.
+    The state and nonce of a pending login live in `state_store` (see
+    services/oauth_state_service.py); the browser only holds an opaque id in a
+    cookie scoped to the flow's routes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        client_id: Optional[str],
+        client_secret: Optional[str],
+        discovery_url: str,
+        scope: str = "openid email profile",
+        state_store,
+        issuers: Optional[list[str]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.name = name
+        self.state_store = state_store
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.discovery_url = discovery_url
+        self.scope = scope
+        self.issuers = issuers
+        self.transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+        self._metadata: Optional[dict] = None
+        self._metadata_expires = 0.0
+        self._jwks: Optional[jwt.PyJWKSet] = None
+        self._jwks_expires = 0.0
+        self._jwks_fetched = 0.0
+
+    # ==================== HTTP ====================
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                timeout=OIDC_HTTP_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=OIDC_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=OIDC_HTTP_MAX_CONNECTIONS,
+                ),
+                transport=self.transport,
+            )
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    # ==================== DISCOVERY / KEYS ====================
+    async def get_metadata(self) -> dict:
+        if self._metadata is None or time.monotonic() >= self._metadata_expires:
+            response = await self.http.get(self.discovery_url)
+            response.raise_for_status()
+            self._metadata = response.json()
+            self._metadata_expires = time.monotonic() + cache_ttl(response)
+        return self._metadata
+
+    async def get_jwks(self, force: bool = False) -> jwt.PyJWKSet:
+        now = time.monotonic()
+        if self._jwks is None or now >= self._jwks_expires or force:
+            metadata = await self.get_metadata()
+            response = await self.http.get(metadata["jwks_uri"])
+            response.raise_for_status()
+            self._jwks = jwt.PyJWKSet.from_dict(response.json())
+            self._jwks_expires = now + cache_ttl(response)
+            self._jwks_fetched = now
+        return self._jwks
+
+    async def _signing_key(self, kid: Optional[str]) -> jwt.PyJWK:
+        jwks = await self.get_jwks()
+        try:
+            return jwks[kid]
+        except KeyError:
+            pass
+        # Provider may have rotated keys before our cached copy expired
+        if time.monotonic() - self._jwks_fetched >= OIDC_JWKS_MIN_REFRESH_SECONDS:
+            jwks = await self.get_jwks(force=True)
+            try:
+                return jwks[kid]
+            except KeyError:
+                pass
+        raise OAuthError(error="invalid_token", description=f"Unknown id_token signing key: {kid}")
+
+    async def warmup(self) -> None:
+        await self.get_metadata()
+        await self.get_jwks()
+
+    # ==================== AUTHORIZATION CODE FLOW ====================
+    @property
+    def cookie_name(self) -> str:
+        return f"oauth_{self.name}"
+
+    def _state_key(self, browser_id: str, state: str) -> str:
+        # Bound to the browser: a state is only accepted together with the cookie it was issued to
+        return f"{self.name}:{browser_id}:{state}"
+
+    async def authorize_redirect(self, request: Request, redirect_uri) -> RedirectResponse:
+        metadata = await self.get_metadata()
+        # Reused across logins, so parallel attempts in several tabs do not invalidate each other
+        browser_id = request.cookies.get(self.cookie_name) or secrets.token_urlsafe(16)
+        state = secrets.token_urlsafe(24)
+        nonce = secrets.token_urlsafe(24)
+        await self.state_store.put(
+            self._state_key(browser_id, state),
+            {"redirect_uri": str(redirect_uri), "nonce": nonce},
+            OIDC_STATE_TTL_SECONDS,
+        )
+        params = {
+            "response_type": "code",
+            "client_id": self.client_id,
+            "redirect_uri": str(redirect_uri),
+            "scope": self.scope,
+            "state": state,
+            "nonce": nonce,
+        }
+        response = RedirectResponse(f"{metadata['authorization_endpoint']}?{urlencode(params)}", status_code=302)
+        callback = urlparse(str(redirect_uri))
+        response.set_cookie(
+            self.cookie_name,
+            browser_id,
+            max_age=OIDC_STATE_TTL_SECONDS,
+            # The callback's directory (/auth/google/), so the login route sees it too but nothing else does
+            path=callback.path.rsplit("/", 1)[0] + "/",
+            secure=callback.scheme == "https",
+            httponly=True,
+            # Lax, so the cookie comes along on the provider's top-level redirect back
+            samesite="lax",
+        )
+        return response
+
+    async def authorize_access_token(self, request: Request) -> dict:
+        params = request.query_params
+        if "error" in params:
+            raise OAuthError(error=params["error"], description=params.get("error_description"))
+        state = params.get("state")
+        browser_id = request.cookies.get(self.cookie_name)
+        saved = await self.state_store.pop(self._state_key(browser_id, state)) if state and browser_id else None
+        if not saved:
+            raise OAuthError(error="mismatching_state", description="CSRF Warning! State not equal in request and response.")
+
+        metadata = await self.get_metadata()
+        response = await self.http.post(
+            metadata["token_endpoint"],
+            data={
+                "grant_type": "authorization_code",
+                "code": params.get("code"),
+                "redirect_uri": saved["redirect_uri"],
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+            },
+            headers={"Accept": "application/json"},
+        )
+        token = response.json()
+        if response.status_code >= 400 or "error" in token:
+            raise OAuthError(error=token.get("error", "token_error"), description=token.get("error_description"))
+
+        if "id_token" in token:
+            token["userinfo"] = await self.parse_id_token(token["id_token"], nonce=saved["nonce"])
+        return token
+
+    async def parse_id_token(self, id_token: str, nonce: Optional[str] = None) -> dict:
+        metadata = await self.get_metadata()
+        try:
+            header = jwt.get_unverified_header(id_token)
+            key = await self._signing_key(header.get("kid"))
+            claims = jwt.decode(
+                id_token,
+                key.key,
+                algorithms=[key.algorithm_name],
+                audience=self.client_id,
+                issuer=self.issuers or metadata["issuer"],
+                leeway=60,
+            )
+        except jwt.InvalidTokenError as e:
+            raise OAuthError(error="invalid_token", description=str(e))
+        if nonce is not None and claims.get("nonce") != nonce:
+            raise OAuthError(error="invalid_token", description="Invalid id_token nonce")
+        return claims
@@ -0,0 +1,24 @@
+from typing import Any
+
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+
+class Serializer:
+    """Precompiled validator and JSON encoder for one response type.
+
+    Validates straight from ORM attributes (or dicts) and dumps JSON bytes in
+    one pass through pydantic-core, instead of FastAPI re-validating the
+    response model and running the result through `jsonable_encoder`. Routes
+    keep `response_model` for the OpenAPI schema and return
+    `serializer.response(value)`, which FastAPI passes through untouched.
+    """
+
+    def __init__(self, type_: Any):
+        self.adapter = TypeAdapter(type_)
+
+    def dump_json(self, value: Any) -> bytes:
+        return self.adapter.dump_json(self.adapter.validate_python(value, from_attributes=True))
+
+    def response(self, value: Any, status_code: int = 200) -> Response:
+        return Response(self.dump_json(value), status_code=status_code, media_type="application/json")